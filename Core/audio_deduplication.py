@@ -2,68 +2,355 @@
 # Provides STT-based deduplication for audio files using Whisper.
 
 import os
+import sys
+import wave
+from array import array
+import atexit
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import ctranslate2
+import numpy as np
 from faster_whisper import WhisperModel
 from pydub import AudioSegment
+try:
+    import cpuinfo
+except ImportError:
+    cpuinfo = None
+try:
+    from pywhispercpp.model import Model as WhisperCppModel
+except ImportError:
+    WhisperCppModel = None
+from Core.llm_handler import log
 
-def log_word_timestamps(input_path, all_words):
+# STT backend for deduplication: "faster" (faster-whisper) or "whispercpp" (pywhispercpp, optional)
+STT_BACKEND = os.getenv("LTTS_STT_BACKEND", "faster").strip().lower()
+# Quantised ggml weights used by the whisper.cpp backend, e.g. base.en-q5_1
+WHISPERCPP_QUANT = os.getenv("LTTS_WHISPERCPP_QUANT", "q5_1")
+# Set LTTS_WHISPER_LOG=0 to skip writing the per-word Whisper log
+WHISPER_LOG_ENABLED = os.getenv("LTTS_WHISPER_LOG", "1") == "1"
+
+# Single background writer so the word log never blocks deduplication
+_log_executor = ThreadPoolExecutor(max_workers=1)
+atexit.register(_log_executor.shutdown, wait=True)
+
+def _detect_ct2_device():
+    # Run Whisper on the GPU when CTranslate2 was built with CUDA and sees a device
+    try:
+        return "cuda" if ctranslate2.get_cuda_device_count() > 0 else "cpu"
+    except Exception:
+        return "cpu"
+
+def _detect_ct2_compute_type(device="cpu"):
+    # Pick the fastest CTranslate2 compute type for this machine.
+    # On CUDA, half precision halves the weight traffic that bounds decoding: float16 where supported
+    # (bfloat16 on GPUs without it). On CPU, pure int8 only wins with VNNI instructions; otherwise
+    # int8_float32 is faster.
+    if device == "cuda":
+        try:
+            supported = ctranslate2.get_supported_compute_types("cuda")
+        except Exception:
+            return "default"
+        for compute_type in ("float16", "bfloat16"):
+            if compute_type in supported:
+                return compute_type
+        return "default"
+    try:
+        supported = ctranslate2.get_supported_compute_types("cpu")
+    except Exception:
+        return "int8"
+    flags = []
+    if cpuinfo:
+        try:
+            flags = cpuinfo.get_cpu_info().get("flags", [])
+        except Exception:
+            flags = []
+    if "int8" in supported and ("avx512_vnni" in flags or "avx_vnni" in flags):
+        return "int8"
+    if "int8_float32" in supported:
+        return "int8_float32"
+    return "int8"
+
+# Detected once at import so every call reuses the same device and compute type.
+# Override with LTTS_WHISPER_DEVICE (cpu/cuda) and LTTS_WHISPER_COMPUTE_TYPE (e.g. float32, bfloat16, int8).
+WHISPER_DEVICE = os.getenv("LTTS_WHISPER_DEVICE", "").strip().lower() or _detect_ct2_device()
+CT2_COMPUTE_TYPE = os.getenv("LTTS_WHISPER_COMPUTE_TYPE", "").strip().lower() or _detect_ct2_compute_type(WHISPER_DEVICE)
+WHISPER_CPU_THREADS = os.cpu_count() or 4
+
+_model_lock = threading.Lock()
+
+@functools.lru_cache(maxsize=4)
+def _load_whisper_model(name, compute_type, device, cpu_threads):
+    return WhisperModel(
+        name,
+        device=device,
+        compute_type=compute_type,
+        cpu_threads=cpu_threads,
+        num_workers=1,
+    )
+
+def _get_whisper_model(name, compute_type=CT2_COMPUTE_TYPE, device=WHISPER_DEVICE, cpu_threads=WHISPER_CPU_THREADS):
+    # Return a cached WhisperModel so repeated runs in the same session skip the weight load.
+    # The lock stops two concurrent first calls from loading the same model twice.
+    with _model_lock:
+        return _load_whisper_model(name, compute_type, device, cpu_threads)
+
+@functools.lru_cache(maxsize=4)
+def _load_whispercpp_model(name, n_threads):
+    return WhisperCppModel(name, n_threads=n_threads, print_progress=False, print_realtime=False)
+
+def _get_whispercpp_model(name):
+    # Return a cached whisper.cpp model using the quantised weights for the requested model name.
+    with _model_lock:
+        return _load_whispercpp_model(f"{name}-{WHISPERCPP_QUANT}", WHISPER_CPU_THREADS)
+
+def preload_whisper_model(name):
+    # Load the Whisper model for the configured backend on a background thread, so the weights are
+    # ready (and cached) by the time the first deduplication runs. Errors are left for that run to report.
+    def _load():
+        try:
+            if STT_BACKEND == "whispercpp" and WhisperCppModel is not None:
+                _get_whispercpp_model(name)
+            else:
+                _get_whisper_model(name)
+        except Exception:
+            pass
+    thread = threading.Thread(target=_load, name="whisper-preload", daemon=True)
+    thread.start()
+    return thread
+
+def _faster_whisper_words(model, audio_f32):
+    # Yield (word, start, end) tuples from faster-whisper as segments are decoded.
+    # The built-in Silero VAD skips long silences; word timestamps are mapped back to the original timeline.
+    segments, _ = model.transcribe(
+        audio_f32,
+        word_timestamps=True,
+        vad_filter=True,
+        vad_parameters={"min_silence_duration_ms": 500},
+    )
+    for segment in segments:
+        for word in segment.words:
+            yield word.word, word.start, word.end
+
+def _whispercpp_words(model, audio_f32):
+    # Yield (word, start, end) tuples from whisper.cpp.
+    # max_len=1 with split_on_word makes whisper.cpp emit one segment per word; t0/t1 are in 10 ms units.
+    for seg in model.transcribe(audio_f32, token_timestamps=True, max_len=1, split_on_word=True):
+        if seg.text.strip():
+            yield seg.text, seg.t0 / 100.0, seg.t1 / 100.0
+
+def _write_word_log(log_path, words, starts, ends):
+    lines = ["%s\t%.2f\t%.2f\n" % row for row in zip(words, starts, ends)]
+    with open(log_path, 'w', encoding='utf-8') as f:
+        f.write("".join(lines))
+
+def _report_word_log_error(future):
+    # Done-callback for the background write: the caller has moved on, so failures go to the log
+    e = future.exception()
+    if e is not None:
+        log(f"Could not write Whisper word log: {e}")
+
+def log_word_timestamps(input_path, words, starts, ends):
     # Save word-level timestamps to a log file in the logs directory.
+    # The file is written on a background thread; the path is known up front so it is returned immediately
+    # and a failed write is reported to the log.
+    if not WHISPER_LOG_ENABLED:
+        return "Whisper word log disabled (LTTS_WHISPER_LOG=0)."
     logs_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'logs')
     os.makedirs(logs_dir, exist_ok=True)
     base = os.path.splitext(os.path.basename(input_path))[0]
     log_path = os.path.join(logs_dir, f"{base}_WHISPERLOG.txt")
-    with open(log_path, 'w', encoding='utf-8') as f:
-        for w in all_words:
-            f.write(f"{w['word']}\t{w['start']:.2f}\t{w['end']:.2f}\n")
-    return f"Whisper word log saved to: {log_path}"
+    _log_executor.submit(_write_word_log, log_path, words, starts, ends).add_done_callback(_report_word_log_error)
+    return f"Whisper word log being written to: {log_path}"
+
+# numpy dtypes for the PCM sample widths pydub can hand back (8-bit WAV is unsigned)
+_PCM_DTYPES = {1: np.uint8, 2: np.int16, 4: np.int32}
+
+def splice_out_segments(audio, to_remove):
+    # Return a copy of an AudioSegment with the sorted (start_ms, end_ms) ranges removed.
+    # The kept ranges are copied from one decoded PCM buffer into a single pre-sized output array.
+    dtype = _PCM_DTYPES.get(audio.sample_width)
+    if dtype is None:
+        # 24-bit audio has no numpy dtype; fall back to pydub slicing
+        last_cut_end = 0
+        clean_audio = AudioSegment.empty()
+        for start_ms, end_ms in to_remove:
+            clean_audio += audio[last_cut_end:start_ms]
+            last_cut_end = end_ms
+        return clean_audio + audio[last_cut_end:]
+    sr = audio.frame_rate
+    ch = audio.channels
+    pcm = np.frombuffer(audio.raw_data, dtype=dtype).reshape(-1, ch)
+    keep_ranges = []
+    last_cut_end = 0
+    for start_ms, end_ms in to_remove:
+        start = int(start_ms * sr / 1000)
+        if start > last_cut_end:
+            keep_ranges.append((last_cut_end, start))
+        last_cut_end = max(last_cut_end, int(end_ms * sr / 1000))
+    keep_ranges.append((last_cut_end, len(pcm)))
+    # Size the output once and copy each kept range into place
+    total = sum(b - a for a, b in keep_ranges if b > a)
+    out = np.empty((total, ch), dtype=pcm.dtype)
+    offset = 0
+    for a, b in keep_ranges:
+        if b > a:
+            out[offset:offset + b - a] = pcm[a:b]
+            offset += b - a
+    return AudioSegment(out.tobytes(), frame_rate=sr, sample_width=audio.sample_width, channels=ch)
+
+def export_audio(audio, output_path):
+    # Write an AudioSegment to disk. WAV output is written straight from the PCM buffer with the
+    # stdlib wave module; other formats go through pydub/ffmpeg.
+    if output_path.lower().endswith('.wav'):
+        with wave.open(output_path, 'wb') as w:
+            w.setnchannels(audio.channels)
+            w.setsampwidth(audio.sample_width)
+            w.setframerate(audio.frame_rate)
+            w.writeframes(audio.raw_data)
+    else:
+        audio.export(output_path, format=output_path.split('.')[-1])
+
+def whisper_input_from_segment(audio):
+    # Convert an already-decoded AudioSegment into the 16 kHz mono float32 array Whisper expects,
+    # so the file does not have to be decoded a second time for transcription.
+    mono = audio.set_channels(1).set_sample_width(2).set_frame_rate(16000)
+    return np.frombuffer(mono.raw_data, dtype=np.int16).astype(np.float32) / 32768.0
 
 def auto_cleaned_filename(input_path):
     # Generate a filename for the cleaned audio output.
     base, ext = os.path.splitext(input_path)
     return f"{base}_Cleaned{ext}"
 
-def find_adjacent_repeats(words, min_words=1, max_phrase_len=20, max_gap_ms=2000):
-    # Find repeated word or phrase segments in the transcript for removal.
-    segments_to_remove = []
-    log_msgs = []
-    i = 0
-    n = len(words)
-    while i < n:
-        found_repeat = False
-        for phrase_len in range(max_phrase_len, min_words - 1, -1):
-            if i + 2 * phrase_len > n:
-                continue
-            seq1 = [w['word'].lower().strip() for w in words[i:i+phrase_len]]
-            seq2 = [w['word'].lower().strip() for w in words[i+phrase_len:i+2*phrase_len]]
-            if seq1 == seq2:
-                gap = (words[i+phrase_len]['start'] - words[i+phrase_len-1]['end']) * 1000
-                if gap <= max_gap_ms:
-                    start_time_ms = words[i+phrase_len]['start'] * 1000
-                    end_time_ms = words[i+2*phrase_len-1]['end'] * 1000
-                    segments_to_remove.append((start_time_ms, end_time_ms))
-                    log_msgs.append(f"Found repeat: {' '.join(seq1)} (len={phrase_len}) at {start_time_ms/1000:.2f}s")
+_HASH_MOD = (1 << 61) - 1
+_HASH_BASE = 1315423911
+
+class RepeatDetector:
+    # Incremental repeat finder: feed words as they are transcribed and call finalize() at the end.
+    # Only a short window of recent words is kept, since a position can be decided once
+    # 2 * max_phrase_len words of lookahead have arrived. Results match find_adjacent_repeats.
+
+    def __init__(self, min_words=1, max_phrase_len=20, max_gap_ms=2000):
+        self.min_words = min_words
+        self.max_phrase_len = max_phrase_len
+        self.max_gap_ms = max_gap_ms
+        self.segments_to_remove = []
+        self.log_msgs = []
+        self._lookahead = max(2 * max_phrase_len, 3)
+        self._keep = 4 * max_phrase_len
+        self._id_map = {}
+        self._tokens = []
+        self._ids = []
+        self._starts = []
+        self._ends = []
+        # Rolling-hash prefixes; _prefix[k] covers the buffered tokens before index k
+        self._prefix = [0]
+        self._powers = [1] * (max_phrase_len + 1)
+        for k in range(1, max_phrase_len + 1):
+            self._powers[k] = (self._powers[k - 1] * _HASH_BASE) % _HASH_MOD
+        self._i = 0
+        # Run-length encoding of identical consecutive tokens, built as words arrive:
+        # _run_of maps each buffered word to its run number, _run_end maps a run to its absolute end.
+        self._run_of = []
+        self._run_end = {}
+        self._next_run = 0
+        self._first_run = 0
+        self._abs_base = 0
+
+    def feed(self, word, start, end):
+        # Add one word with its start/end times (seconds) and scan any positions that are now decidable.
+        # Interned so repeated tokens share one string and the id lookup short-circuits on identity
+        tok = sys.intern(word.lower().strip())
+        tok_id = self._id_map.setdefault(tok, len(self._id_map) + 1)
+        if self._ids and self._ids[-1] == tok_id:
+            run = self._run_of[-1]
+            self._run_end[run] += 1
+        else:
+            run = self._next_run
+            self._next_run += 1
+            self._run_end[run] = self._abs_base + len(self._ids) + 1
+        self._run_of.append(run)
+        self._tokens.append(tok)
+        self._ids.append(tok_id)
+        self._starts.append(start)
+        self._ends.append(end)
+        self._prefix.append((self._prefix[-1] * _HASH_BASE + tok_id) % _HASH_MOD)
+        self._scan(final=False)
+
+    def finalize(self):
+        # Scan the remaining tail and return (segments_to_remove, log_msgs).
+        self._scan(final=True)
+        return self.segments_to_remove, self.log_msgs
+
+    def _span_hash(self, a, length):
+        return (self._prefix[a + length] - self._prefix[a] * self._powers[length]) % _HASH_MOD
+
+    def _scan(self, final):
+        tokens, ids, starts, ends = self._tokens, self._ids, self._starts, self._ends
+        n = len(ids)
+        i = self._i
+        while i < n:
+            if not final and i + self._lookahead > n:
+                break
+            found_repeat = False
+            for phrase_len in range(self.max_phrase_len, self.min_words - 1, -1):
+                if i + 2 * phrase_len > n:
+                    continue
+                mid = i + phrase_len
+                if self._span_hash(i, phrase_len) != self._span_hash(mid, phrase_len):
+                    continue
+                if ids[i:mid] != ids[mid:mid + phrase_len]:
+                    continue
+                gap = (starts[mid] - ends[mid - 1]) * 1000
+                if gap <= self.max_gap_ms:
+                    start_time_ms = starts[mid] * 1000
+                    end_time_ms = ends[mid + phrase_len - 1] * 1000
+                    self.segments_to_remove.append((start_time_ms, end_time_ms))
+                    self.log_msgs.append(f"Found repeat: {' '.join(tokens[i:mid])} (len={phrase_len}) at {start_time_ms/1000:.2f}s")
                     i += phrase_len
                     found_repeat = True
                     break
-        # Special case: single word repeated 3+ times in a row
-        if not found_repeat and i+2 < n:
-            w1 = words[i]['word'].lower().strip()
-            w2 = words[i+1]['word'].lower().strip()
-            w3 = words[i+2]['word'].lower().strip()
-            if w1 == w2 == w3:
-                repeat_len = 3
-                while i+repeat_len < n and words[i+repeat_len]['word'].lower().strip() == w1:
-                    repeat_len += 1
-                start_time_ms = words[i+1]['start'] * 1000
-                end_time_ms = words[i+repeat_len-1]['end'] * 1000
-                segments_to_remove.append((start_time_ms, end_time_ms))
-                log_msgs.append(f"Found single-word repeat: {w1} x{repeat_len} at {start_time_ms/1000:.2f}s")
-                i += repeat_len
-                found_repeat = True
-        if not found_repeat:
-            i += 1
-    return segments_to_remove, log_msgs
-
-def clean_audio_with_stt(input_path, output_path, whisper_model="base.en"):
+            # Special case: single word repeated 3+ times in a row
+            if not found_repeat and i+2 < n:
+                run_end = self._run_end[self._run_of[i]] - self._abs_base
+                repeat_len = run_end - i
+                if repeat_len >= 3:
+                    if not final and run_end == n:
+                        # The run may continue in words that have not arrived yet
+                        break
+                    start_time_ms = starts[i+1] * 1000
+                    end_time_ms = ends[i+repeat_len-1] * 1000
+                    self.segments_to_remove.append((start_time_ms, end_time_ms))
+                    self.log_msgs.append(f"Found single-word repeat: {tokens[i]} x{repeat_len} at {start_time_ms/1000:.2f}s")
+                    i += repeat_len
+                    found_repeat = True
+            if not found_repeat:
+                i += 1
+        self._i = i
+        # Drop words the scanner can no longer look back at
+        if i > self._keep:
+            del tokens[:i]
+            del ids[:i]
+            del starts[:i]
+            del ends[:i]
+            del self._prefix[:i]
+            del self._run_of[:i]
+            self._abs_base += i
+            self._i = 0
+            first_live = self._run_of[0] if self._run_of else self._next_run
+            while self._first_run < first_live:
+                del self._run_end[self._first_run]
+                self._first_run += 1
+
+def find_adjacent_repeats(words, starts, ends, min_words=1, max_phrase_len=20, max_gap_ms=2000):
+    # Find repeated word or phrase segments in the transcript for removal.
+    # Takes parallel sequences of words and their start/end times in seconds.
+    detector = RepeatDetector(min_words=min_words, max_phrase_len=max_phrase_len, max_gap_ms=max_gap_ms)
+    for word, start, end in zip(words, starts, ends):
+        detector.feed(word, start, end)
+    return detector.finalize()
+
+def clean_audio_with_stt(input_path, output_path, whisper_model="tiny.en"):
     # Generator version for Gradio: yields status messages for real-time UI updates.
     try:
         # Check audio file size and duration before processing
@@ -75,17 +362,32 @@ def clean_audio_with_stt(input_path, output_path, whisper_model="base.en"):
         if duration_sec < 0.5:
             yield f"Error: Audio file '{input_path}' is too short to process (duration: {duration_sec:.2f}s)."
             return
+        use_whispercpp = STT_BACKEND == "whispercpp"
+        if use_whispercpp and WhisperCppModel is None:
+            yield "pywhispercpp is not installed. Falling back to faster-whisper."
+            use_whispercpp = False
         yield "Loading Whisper model..."
-        model = WhisperModel(whisper_model, device="cpu", compute_type="int8")
+        if use_whispercpp:
+            words = _whispercpp_words(_get_whispercpp_model(whisper_model), whisper_input_from_segment(audio))
+        else:
+            words = _faster_whisper_words(_get_whisper_model(whisper_model), whisper_input_from_segment(audio))
         yield f"Transcribing {input_path} with word-level timestamps..."
-        segments, _ = model.transcribe(input_path, word_timestamps=True)
-        all_words = []
-        for segment in segments:
-            for word in segment.words:
-                all_words.append({'word': word.word, 'start': word.start, 'end': word.end})
-        log_msg = log_word_timestamps(input_path, all_words)
+        # Feed words to the repeat detector while transcription is still running
+        detector = RepeatDetector(min_words=1, max_phrase_len=20, max_gap_ms=2000)
+        # Words are kept as parallel arrays for the word log rather than one dict per word
+        words_list, starts_arr, ends_arr = [], array('d'), array('d')
+        next_report_sec = 60
+        for word, start, end in words:
+            words_list.append(word)
+            starts_arr.append(start)
+            ends_arr.append(end)
+            detector.feed(word, start, end)
+            if end >= next_report_sec:
+                yield f"Transcribed {end:.0f}s of {duration_sec:.0f}s..."
+                next_report_sec = end + 60
+        log_msg = log_word_timestamps(input_path, words_list, starts_arr, ends_arr)
         yield log_msg
-        to_remove, repeat_logs = find_adjacent_repeats(all_words, min_words=1, max_phrase_len=20, max_gap_ms=2000)
+        to_remove, repeat_logs = detector.finalize()
         if not to_remove:
             yield "No repeated segments found. The audio is already clean."
             return
@@ -93,14 +395,9 @@ def clean_audio_with_stt(input_path, output_path, whisper_model="base.en"):
         for msg in repeat_logs:
             yield msg
         to_remove.sort()
-        last_cut_end = 0
-        clean_audio = AudioSegment.empty()
-        for start_ms, end_ms in to_remove:
-            clean_audio += audio[last_cut_end:start_ms]
-            last_cut_end = end_ms
-        clean_audio += audio[last_cut_end:]
+        clean_audio = splice_out_segments(audio, to_remove)
         yield f"Exporting cleaned audio to {output_path}"
-        clean_audio.export(output_path, format=output_path.split('.')[-1])
+        export_audio(clean_audio, output_path)
         yield "Done!"
     except Exception as e:
         yield f"Error during audio deduplication: {str(e)}"
@@ -3,24 +3,69 @@
 # All logic is GUI-agnostic and suitable for use with a Gradio web interface.
 
 import os
+import wave
+from concurrent.futures import ThreadPoolExecutor
 from pydub import AudioSegment
 
+def _read_wav(path):
+    # Read a PCM WAV file without decoding. Returns ((channels, sample_width, frame_rate), frames).
+    with wave.open(path, 'rb') as w:
+        params = (w.getnchannels(), w.getsampwidth(), w.getframerate())
+        frames = w.readframes(w.getnframes())
+    return params, frames
+
+def _concatenate_wav_frames(audio_paths, combined_path, pause_ms):
+    # Join PCM WAV files by copying raw frames straight into one output file.
+    # Raises ValueError if the inputs do not share a format, so the caller can fall back to pydub.
+    # Files are read on a small thread pool (file reads release the GIL); map() keeps them in order.
+    writer = None
+    try:
+        with ThreadPoolExecutor(max_workers=min(8, len(audio_paths))) as executor:
+            wavs = executor.map(_read_wav, audio_paths)
+            for idx, (path, (params, frames)) in enumerate(zip(audio_paths, wavs)):
+                channels, sample_width, frame_rate = params
+                frame_size = channels * sample_width
+                if len(frames) < frame_size * frame_rate // 2:  # less than 0.5s
+                    label = "First audio file" if idx == 0 else "Audio file"
+                    print(f"Warning: {label} '{path}' is very short ({len(frames) / frame_size / frame_rate:.2f}s)")
+                if writer is None:
+                    first_params = params
+                    writer = wave.open(combined_path, 'wb')
+                    writer.setnchannels(channels)
+                    writer.setsampwidth(sample_width)
+                    writer.setframerate(frame_rate)
+                    # 8-bit WAV is unsigned, so its silence is 0x80 rather than 0x00
+                    silence_byte = b'\x80' if sample_width == 1 else b'\x00'
+                    pause = silence_byte * (int(frame_rate * pause_ms / 1000) * frame_size)
+                elif params != first_params:
+                    raise ValueError(f"'{path}' format {params} does not match {first_params}")
+                else:
+                    writer.writeframesraw(pause)
+                writer.writeframesraw(frames)
+    finally:
+        if writer is not None:
+            writer.close()
+
+def _concatenate_with_pydub(audio_paths, combined_path, pause_ms):
+    # Fallback for inputs the wave module cannot read directly (compressed or mismatched formats).
+    pause = AudioSegment.silent(duration=pause_ms)
+    combined = AudioSegment.from_wav(audio_paths[0])
+    if len(combined) < 500:  # less than 0.5s
+        # Warn if the first file is too short
+        print(f"Warning: First audio file '{audio_paths[0]}' is very short ({len(combined)/1000:.2f}s)")
+    for path in audio_paths[1:]:
+        seg = AudioSegment.from_wav(path)
+        if len(seg) < 500:
+            print(f"Warning: Audio file '{path}' is very short ({len(seg)/1000:.2f}s)")
+        combined += pause + seg
+    combined.export(combined_path, format='wav')
+
 def concatenate_audio(audio_paths, output_dir, pause_ms=1000, source_doc_path=None):
     # Concatenate a list of WAV file paths with a pause between each segment.
     # Returns the path to the combined audio file for further processing.
     if not audio_paths:
         return None
     try:
-        pause = AudioSegment.silent(duration=pause_ms)
-        combined = AudioSegment.from_wav(audio_paths[0])
-        if len(combined) < 500:  # less than 0.5s
-            # Warn if the first file is too short
-            print(f"Warning: First audio file '{audio_paths[0]}' is very short ({len(combined)/1000:.2f}s)")
-        for path in audio_paths[1:]:
-            seg = AudioSegment.from_wav(path)
-            if len(seg) < 500:
-                print(f"Warning: Audio file '{path}' is very short ({len(seg)/1000:.2f}s)")
-            combined += pause + seg
         os.makedirs(output_dir, exist_ok=True)
         # Use the base name of the original document if available, otherwise use a default name
         if source_doc_path:
@@ -28,7 +73,11 @@ def concatenate_audio(audio_paths, output_dir, pause_ms=1000, source_doc_path=No
         else:
             orig_base = 'combined_audio'
         combined_path = os.path.join(output_dir, f"{orig_base}.wav")
-        combined.export(combined_path, format='wav')
+        try:
+            _concatenate_wav_frames(audio_paths, combined_path, pause_ms)
+        except (wave.Error, ValueError) as e:
+            print(f"Raw WAV concatenation unavailable ({e}); falling back to pydub.")
+            _concatenate_with_pydub(audio_paths, combined_path, pause_ms)
         return combined_path
     except Exception as e:
         print(f"Error during audio concatenation: {str(e)}")
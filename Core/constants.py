@@ -7,6 +7,9 @@
 # ============================================================================
 
 import json
+import collections.abc
+import configparser
+import functools
 import urllib.request
 import datetime
 import subprocess
@@ -32,13 +35,87 @@ def get_state():
 		return "Unknown"
 
 
+def _find_repo_git_config():
+	# Walk up from the working directory to the nearest .git/config, if any.
+	path = os.path.abspath(os.getcwd())
+	while True:
+		candidate = os.path.join(path, '.git', 'config')
+		if os.path.isfile(candidate):
+			return candidate
+		parent = os.path.dirname(path)
+		if parent == path:
+			return None
+		path = parent
+
+_GIT_ESCAPES = {'\\': '\\', '"': '"', 'n': '\n', 't': '\t', 'b': '\b'}
+
+def _git_config_value(raw):
+	# Decode a raw config value the way git does: strip inline ';'/'#' comments and trailing
+	# whitespace outside quotes, drop the quotes themselves and resolve backslash escapes.
+	# Returns None for anything this does not handle (line continuations, unknown escapes).
+	if raw is None:
+		return None
+	out = []
+	kept = 0
+	quoted = False
+	chars = iter(raw)
+	for ch in chars:
+		if ch == '\\':
+			esc = next(chars, None)
+			if esc not in _GIT_ESCAPES:
+				return None
+			out.append(_GIT_ESCAPES[esc])
+			kept = len(out)
+		elif ch == '"':
+			quoted = not quoted
+		elif not quoted and ch in ';#':
+			break
+		else:
+			out.append(ch)
+			if quoted or not ch.isspace():
+				kept = len(out)
+	if quoted:
+		return None
+	return ''.join(out[:kept]) or None
+
+@functools.lru_cache(maxsize=1)
+def _read_git_user():
+	# Read user.name/user.email straight from git's config files instead of spawning git.
+	# Files are read in git's order (XDG, then ~/.gitconfig, then the repository) so later ones win.
+	# Configs using include/includeIf are left to the git subprocess fallback.
+	xdg_home = os.environ.get('XDG_CONFIG_HOME') or os.path.expanduser('~/.config')
+	paths = [os.path.join(xdg_home, 'git', 'config'), os.path.expanduser('~/.gitconfig')]
+	repo_config = _find_repo_git_config()
+	if repo_config:
+		paths.append(repo_config)
+	try:
+		cp = configparser.ConfigParser(strict=False, interpolation=None, allow_no_value=True,
+			comment_prefixes=('#', ';'), inline_comment_prefixes=None)
+		cp.read(paths, encoding='utf-8')
+	except Exception:
+		return None, None
+	if any(section.lower().startswith('include') for section in cp.sections()):
+		return None, None
+	name = email = None
+	for section in cp.sections():
+		if section.lower() == 'user':
+			name = _git_config_value(cp.get(section, 'name', fallback=None)) or name
+			email = _git_config_value(cp.get(section, 'email', fallback=None)) or email
+	return name, email
+
 def get_git_username():
+	name = _read_git_user()[0]
+	if name:
+		return name
 	try:
 		return subprocess.check_output(['git', 'config', 'user.name'], encoding='utf-8').strip()
 	except Exception:
 		return "Testing"
 
 def get_git_email():
+	email = _read_git_user()[1]
+	if email:
+		return email
 	try:
 		return subprocess.check_output(['git', 'config', 'user.email'], encoding='utf-8').strip()
 	except Exception:
@@ -93,22 +170,38 @@ def get_greeting(username):
 	return f"Good {part} {username}"
 
 # User-editable constants for prompt template replacement
-
-USER_CONSTANTS = {
-	"State": get_state(),
-	"Username": get_git_username(),
-	"UserEmail": get_git_email(),
-	"Time": get_system_time(),
-	"ShortTime": get_short_time(),
-	"Date": get_date(),
-	"DayOfWeek": get_day_of_week(),
-	"Timezone": get_timezone(),
-	"ProjectName": get_project_name(),
-	"SessionID": get_session_id(),
-	"Country": get_country(),
-	"Greeting": None,  # Will be set below
+# Values are computed on first access, so importing this module does not block on the
+# ipinfo.io lookup or git subprocess calls.
+
+class _LazyConstants(collections.abc.Mapping):
+	def __init__(self, providers):
+		self._providers = providers
+		self._cache = {}
+
+	def __getitem__(self, key):
+		if key not in self._cache:
+			self._cache[key] = self._providers[key]()
+		return self._cache[key]
+
+	def __iter__(self):
+		return iter(self._providers)
+
+	def __len__(self):
+		return len(self._providers)
+
+USER_CONSTANTS = _LazyConstants({
+	"State": get_state,
+	"Username": get_git_username,
+	"UserEmail": get_git_email,
+	"Time": get_system_time,
+	"ShortTime": get_short_time,
+	"Date": get_date,
+	"DayOfWeek": get_day_of_week,
+	"Timezone": get_timezone,
+	"ProjectName": get_project_name,
+	"SessionID": get_session_id,
+	"Country": get_country,
+	# Greeting depends on Username, so it reads it through the mapping
+	"Greeting": lambda: get_greeting(USER_CONSTANTS["Username"]),
 	# Add more user constants here
-}
-
-# Set Greeting after Username is available
-USER_CONSTANTS["Greeting"] = get_greeting(USER_CONSTANTS["Username"])
+})
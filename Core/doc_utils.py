@@ -4,35 +4,140 @@
 
 import os
 import re
+import contextlib
+import functools
+import hashlib
+import logging
+import mmap
+import subprocess
+import tempfile
+import threading
+import zipfile
+from pathlib import Path
+from xml.sax.saxutils import escape as xml_escape
 import pypandoc
 import shutil
 import urllib.parse
 import pythoncom
 import win32com.client
 from docx import Document
+from docx.oxml.ns import qn
+from docx.oxml import parse_xml
+from lxml import etree
 from Core.constants import MAX_CHUNK_LENGTH
 from Core.llm_handler import log
 
 
+# Cleanup patterns applied to every paragraph by preprocess_docx, in this order. They stay
+# separate passes: each one sees the text left by the previous ones (e.g. digits brought together
+# by removing a bracketed number or an email can then match the phone pattern).
+_NUM_IN_BRACKETS = re.compile(r'\[\s*\d+\s*\]')
+_HANGING_DASH = re.compile(r' - ')
+_PHONE = re.compile(r'\b\+?\d[\d\s\-]{7,}\d\b')
+_EMAIL = re.compile(r'[\w\.-]+@[\w\.-]+')
+_PARA_NUMBER = re.compile(r'^(\(?[a-zA-Z0-9]+\)?[\.|\)]\s*)')
+
+def _clean_paragraph_text(text):
+    # Apply the preprocess_docx text cleanup to a single paragraph string.
+    text = _NUM_IN_BRACKETS.sub('', text)
+    text = _HANGING_DASH.sub(' ', text)
+    text = _PHONE.sub('', text)
+    text = _EMAIL.sub('', text)
+    return _PARA_NUMBER.sub('', text).strip()
+
+# WordprocessingML tags used when streaming paragraphs straight out of word/document.xml
+_W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+_W_BODY = _W + 'body'
+_W_P = _W + 'p'
+_W_R = _W + 'r'
+_W_HYPERLINK = _W + 'hyperlink'
+_W_T = _W + 't'
+_W_TAB = _W + 'tab'
+_W_PTAB = _W + 'ptab'
+_W_BR = _W + 'br'
+_W_CR = _W + 'cr'
+_W_NO_BREAK_HYPHEN = _W + 'noBreakHyphen'
+_W_TYPE = _W + 'type'
+_W_PPR = _W + 'pPr'
+_XML_SPACE = '{http://www.w3.org/XML/1998/namespace}space'
+
+def _run_text(run):
+    # Same mapping python-docx uses for Run.text: tabs and line breaks become \t and \n.
+    parts = []
+    for child in run:
+        tag = child.tag
+        if tag == _W_T:
+            parts.append(child.text or '')
+        elif tag == _W_TAB or tag == _W_PTAB:
+            parts.append('\t')
+        elif tag == _W_CR:
+            parts.append('\n')
+        elif tag == _W_BR:
+            if child.get(_W_TYPE, 'textWrapping') == 'textWrapping':
+                parts.append('\n')
+        elif tag == _W_NO_BREAK_HYPHEN:
+            parts.append('-')
+    return ''.join(parts)
+
+def _paragraph_text(p):
+    # Text of a <w:p>: its direct runs plus runs inside hyperlinks, like Paragraph.text.
+    parts = []
+    for child in p:
+        if child.tag == _W_R:
+            parts.append(_run_text(child))
+        elif child.tag == _W_HYPERLINK:
+            parts.extend(_run_text(r) for r in child if r.tag == _W_R)
+    return ''.join(parts)
+
+_RUN_CONTROL_CHARS = re.compile(r'([\t\n\r])')
+
+def _set_paragraph_text(p, text):
+    # Equivalent of Paragraph.text = text on a raw <w:p>: keep pPr, replace everything else with
+    # a single run, mapping tabs to <w:tab/> and line breaks to <w:br/> like Run.text.
+    for child in list(p):
+        if child.tag != _W_PPR:
+            p.remove(child)
+    run = etree.SubElement(p, _W_R)
+    for piece in _RUN_CONTROL_CHARS.split(text):
+        if not piece:
+            continue
+        if piece == '\t':
+            etree.SubElement(run, _W_TAB)
+        elif piece == '\n' or piece == '\r':
+            etree.SubElement(run, _W_BR)
+        else:
+            t = etree.SubElement(run, _W_T)
+            t.text = piece
+            if piece != piece.strip():
+                t.set(_XML_SPACE, 'preserve')
+
+def iter_docx_paragraphs(docx_path):
+    # Yield the text of each body paragraph (as Document.paragraphs would) without building
+    # the whole python-docx object tree. Finished elements are cleared so memory stays flat.
+    with zipfile.ZipFile(docx_path) as zf, zf.open('word/document.xml') as xml:
+        for _, elem in etree.iterparse(xml, events=('end',), tag=_W_P):
+            parent = elem.getparent()
+            # Paragraphs inside tables and text boxes are not part of Document.paragraphs;
+            # they are released along with their top-level container below.
+            if parent is None or parent.tag != _W_BODY:
+                continue
+            yield _paragraph_text(elem)
+            elem.clear()
+            while elem.getprevious() is not None:
+                del parent[0]
+
 
 def extract_text_from_docx(docx_path):
     # Extract all text from a .docx file and return as a single string.
     try:
-        doc = Document(docx_path)
-        return '\n'.join([p.text for p in doc.paragraphs if p.text.strip()])
+        return '\n'.join(t for t in iter_docx_paragraphs(docx_path) if t.strip())
     except Exception as e:
         log(f"Error extracting text from docx file: {e}")
         return ""
 
 def extract_paragraph_chunks(docx_path):
     # Extract non-empty paragraphs from a .docx file as a list of strings (chunks).
-    doc = Document(docx_path)
-    chunks = []
-    for p in doc.paragraphs:
-        text = p.text.strip()
-        if text:
-            chunks.append(text)
-    return chunks
+    return [t for t in (p.strip() for p in iter_docx_paragraphs(docx_path)) if t]
 
 def split_long_paragraphs(paragraphs, max_length=MAX_CHUNK_LENGTH):
     # Split paragraphs longer than max_length into smaller chunks, breaking at sentence boundaries if possible.
@@ -41,26 +146,66 @@ def split_long_paragraphs(paragraphs, max_length=MAX_CHUNK_LENGTH):
         if len(para) <= max_length:
             chunks.append(para)
         else:
-            log(f"Splitting long paragraph of length {len(para)}")
+            log("Splitting long paragraph of length %d", len(para), level=logging.DEBUG)
+            para_len = len(para)
             start = 0
-            while start < len(para):
-                if len(para) - start <= max_length:
+            # Next '.' and '!' at or after the current search position; None once there are no more.
+            # Both only move forward, so each terminator is located once for the whole paragraph.
+            next_dot = next_bang = 0
+            while start < para_len:
+                if para_len - start <= max_length:
                     chunks.append(para[start:].strip())
                     break
-                split_idx = start + max_length
-                match = re.search(r'[.!]', para[split_idx:])
-                if match:
-                    end = split_idx + match.end()
-                    chunks.append(para[start:end].strip())
-                    start = end
+                pos = start + max_length
+                if next_dot is not None and next_dot < pos:
+                    next_dot = para.find('.', pos)
+                    if next_dot < 0:
+                        next_dot = None
+                if next_bang is not None and next_bang < pos:
+                    next_bang = para.find('!', pos)
+                    if next_bang < 0:
+                        next_bang = None
+                if next_dot is None and next_bang is None:
+                    chunks.append(para[start:pos].strip())
+                    start = pos
+                    continue
+                if next_bang is None or (next_dot is not None and next_dot < next_bang):
+                    end = next_dot + 1
                 else:
-                    chunks.append(para[start:start+max_length].strip())
-                    start += max_length
+                    end = next_bang + 1
+                chunks.append(para[start:end].strip())
+                start = end
     return chunks
 
+@functools.lru_cache(maxsize=4096)
 def normalize_path(path):
     # Normalize a file path by removing URL encoding and normalizing slashes.
-    return os.path.abspath(os.path.normpath(urllib.parse.unquote(path)))
+    # Cached per input string; relative paths resolve against the working directory, which the app never changes.
+    if '%' in path:
+        path = urllib.parse.unquote(path)
+    return os.path.abspath(os.path.normpath(path))
+
+
+def _paragraph_xml(text):
+    # <w:p> markup equivalent to Document.add_paragraph(text); tabs become <w:tab/> as in Run.text.
+    if not text:
+        return '<w:p/>'
+    parts = []
+    for i, piece in enumerate(text.split('\t')):
+        if i:
+            parts.append('<w:tab/>')
+        if piece:
+            space = ' xml:space="preserve"' if piece != piece.strip() else ''
+            parts.append(f'<w:t{space}>{xml_escape(piece)}</w:t>')
+    return f'<w:p><w:r>{"".join(parts)}</w:r></w:p>'
+
+def _append_text_paragraphs(doc, lines):
+    # Add one paragraph per line in a single parse instead of one add_paragraph() call each.
+    fragment = parse_xml(f'<w:body xmlns:w="{_W[1:-1]}">{"".join(_paragraph_xml(line) for line in lines)}</w:body>')
+    body = doc.element.body
+    sect_pr = body.find(qn('w:sectPr'))
+    index = body.index(sect_pr) if sect_pr is not None else len(body)
+    body[index:index] = list(fragment)
 
 
 def convert_rtf_to_docx(rtf_path):
@@ -89,11 +234,11 @@ def convert_to_docx(input_path):
         return process_pdf(input_path)
     elif ext == ".txt":
         # Convert .txt to .docx by reading text and writing to a new docx file
-        from docx import Document
+        lines = _read_text_file(input_path).split('\n')
+        if lines and not lines[-1]:
+            lines.pop()
         doc = Document()
-        with open(input_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                doc.add_paragraph(line.rstrip())
+        _append_text_paragraphs(doc, (line.rstrip() for line in lines))
         docx_path = os.path.splitext(input_path)[0] + ".docx"
         doc.save(docx_path)
         log(f"Converted TXT to DOCX: {docx_path}")
@@ -103,59 +248,229 @@ def convert_to_docx(input_path):
         raise ValueError(f"Unsupported file type for conversion: {input_path} (extension: '{ext}')")
 
 
+# Word automation: one hidden private Word instance per thread, reused by every conversion inside a
+# word_session() on that thread and quit when the outermost session ends. COM proxies are bound to
+# the apartment (thread) that created them, so an instance is only ever used and quit on its owning
+# thread, which then uninitializes COM; nothing is left running once the conversions are done.
+_word_local = threading.local()
+
+@contextlib.contextmanager
+def word_session():
+    # Keep this thread's Word instance alive across several conversions (e.g. a batch of PDFs).
+    # A conversion outside any session is a session of its own, so Word is quit right after it.
+    depth = getattr(_word_local, 'depth', 0)
+    _word_local.depth = depth + 1
+    try:
+        yield
+    finally:
+        _word_local.depth = depth
+        if depth == 0:
+            _discard_word()
+
+def _get_word():
+    # Return this thread's Word.Application, launching it on first use.
+    word = getattr(_word_local, 'word', None)
+    if word is None:
+        if not getattr(_word_local, 'com_initialized', False):
+            pythoncom.CoInitialize()
+            _word_local.com_initialized = True
+        # DispatchEx starts a private instance, so Quit() never closes the user's own documents
+        word = win32com.client.DispatchEx("Word.Application")
+        word.Visible = False
+        word.DisplayAlerts = 0  # wdAlertsNone
+        _word_local.word = word
+    return word
+
+def _discard_word():
+    # Quit this thread's Word instance (at the end of a session, or after a failure such as Word
+    # being closed or crashing) and release COM on this thread.
+    word = getattr(_word_local, 'word', None)
+    _word_local.word = None
+    if word is not None:
+        try:
+            word.Quit()
+        except Exception as e:
+            log(f"Could not quit Word: {e}")
+        # Drop the proxy before COM is uninitialized below
+        word = None
+    if getattr(_word_local, 'com_initialized', False) and not getattr(_word_local, 'depth', 0):
+        _word_local.com_initialized = False
+        pythoncom.CoUninitialize()
+
+def _word_convert(src_path, dst_path, file_format):
+    word = _get_word()
+    try:
+        doc = word.Documents.Open(src_path, ConfirmConversions=False, ReadOnly=True, AddToRecentFiles=False)
+        try:
+            doc.SaveAs(dst_path, FileFormat=file_format)
+        finally:
+            doc.Close(False)
+    except Exception:
+        # Release the proxies held by this frame (the traceback keeps it alive) before quitting
+        doc = word = None
+        _discard_word()
+        raise
+
+def _word_save_as(src_path, dst_path, file_format):
+    # Open src_path in this thread's Word instance and save it as dst_path in file_format.
+    with word_session():
+        _word_convert(src_path, dst_path, file_format)
+
+# DOCX -> PDF backend: "word" (COM automation), "soffice" (LibreOffice headless) or "auto",
+# which uses Word and falls back to LibreOffice when Word automation fails or is missing.
+DOCX_PDF_BACKEND = os.getenv("LTTS_DOCX_PDF", "auto").strip().lower()
+SOFFICE_TIMEOUT = 300
+
+def _word_docx_to_pdf(docx_path, pdf_path):
+    _word_save_as(docx_path, pdf_path, 17)  # 17 = wdFormatPDF
+
+def _find_soffice():
+    return shutil.which("soffice") or shutil.which("libreoffice")
+
+def _soffice_docx_to_pdf(docx_path, pdf_path):
+    # One LibreOffice profile per process/thread: soffice refuses to start a second instance on
+    # a profile that is already in use, which would otherwise serialise parallel conversions.
+    soffice = _find_soffice()
+    if not soffice:
+        raise RuntimeError("LibreOffice (soffice) was not found on PATH.")
+    profile_dir = os.path.join(tempfile.gettempdir(), f"lo_{os.getpid()}_{threading.get_ident()}")
+    out_dir = tempfile.mkdtemp(prefix="ltts_soffice_")
+    try:
+        subprocess.run(
+            [soffice, f"-env:UserInstallation={Path(profile_dir).as_uri()}", "--headless",
+             "--convert-to", "pdf", "--outdir", out_dir, docx_path],
+            check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=SOFFICE_TIMEOUT,
+        )
+        produced = os.path.join(out_dir, os.path.splitext(os.path.basename(docx_path))[0] + ".pdf")
+        if not os.path.exists(produced):
+            raise RuntimeError(f"LibreOffice did not produce a PDF for {docx_path}.")
+        shutil.move(produced, pdf_path)
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+_DOCX_PDF_BACKENDS = {
+    "word": _word_docx_to_pdf,
+    "soffice": _soffice_docx_to_pdf,
+}
+
+def docx_to_pdf(docx_path: str, pdf_path: str) -> None:
+    # Convert a DOCX file to PDF with the configured backend (see DOCX_PDF_BACKEND).
+    docx_path = os.path.normpath(os.path.abspath(docx_path))
+    pdf_path = os.path.normpath(os.path.abspath(pdf_path))
+    if DOCX_PDF_BACKEND in _DOCX_PDF_BACKENDS:
+        _DOCX_PDF_BACKENDS[DOCX_PDF_BACKEND](docx_path, pdf_path)
+        log(f"Converted DOCX to PDF using {DOCX_PDF_BACKEND}: {pdf_path}")
+        return
+    try:
+        _word_docx_to_pdf(docx_path, pdf_path)
+        log(f"Converted DOCX to PDF using Word: {pdf_path}")
+    except Exception as e:
+        if not _find_soffice():
+            raise
+        log(f"Word automation failed: {e}. Falling back to LibreOffice for PDF conversion.")
+        _soffice_docx_to_pdf(docx_path, pdf_path)
+        log(f"Converted DOCX to PDF using LibreOffice: {pdf_path}")
+
+
+# pdf2docx holds every parsed page in memory until the DOCX is written; converting in page
+# ranges and stitching the parts keeps peak memory at about one range's worth.
+PDF2DOCX_PAGES_PER_CHUNK = 25
+
+def _merge_docx_files(part_paths, docx_path):
+    # Concatenate the body content of several DOCX files into docx_path, re-pointing image
+    # and hyperlink relationships at the merged document.
+    merged = Document(part_paths[0])
+    body = merged.element.body
+    sect_pr = body.find(qn('w:sectPr'))
+    rel_attrs = (qn('r:id'), qn('r:embed'), qn('r:link'))
+    taken_partnames = {part.partname for part in merged.part.package.iter_parts()}
+    adopted_parts = set()
+    for part_path in part_paths[1:]:
+        src = Document(part_path)
+        for element in list(src.element.body):
+            if element.tag == qn('w:sectPr'):
+                continue
+            for node in element.iter():
+                for attr in rel_attrs:
+                    rid = node.get(attr)
+                    if rid is None or rid not in src.part.rels:
+                        continue
+                    rel = src.part.rels[rid]
+                    if rel.is_external:
+                        new_rid = merged.part.relate_to(rel.target_ref, rel.reltype, is_external=True)
+                    else:
+                        part = rel.target_part
+                        if part not in adopted_parts and part.partname in taken_partnames:
+                            # Each part file numbers its media from 1; rename before adopting the part
+                            template = re.sub(r'\d*(\.\w+)$', r'%d\1', part.partname)
+                            part.partname = merged.part.package.next_partname(template)
+                        taken_partnames.add(part.partname)
+                        adopted_parts.add(part)
+                        new_rid = merged.part.relate_to(part, rel.reltype)
+                    node.set(attr, new_rid)
+            if sect_pr is not None:
+                sect_pr.addprevious(element)
+            else:
+                body.append(element)
+    merged.save(docx_path)
+
+def _pdf2docx_convert(pdf_path, docx_path):
+    # Convert with pdf2docx, PDF2DOCX_PAGES_PER_CHUNK pages at a time for long documents.
+    from pdf2docx import Converter
+    cv = Converter(pdf_path)
+    try:
+        page_count = cv.fitz_doc.page_count
+        if page_count <= PDF2DOCX_PAGES_PER_CHUNK:
+            cv.convert(docx_path, start=0, end=None)
+            return
+    finally:
+        cv.close()
+    base = os.path.splitext(docx_path)[0]
+    part_paths = []
+    try:
+        for start in range(0, page_count, PDF2DOCX_PAGES_PER_CHUNK):
+            end = min(start + PDF2DOCX_PAGES_PER_CHUNK, page_count)
+            part_path = f"{base}_p{start}.docx"
+            part_paths.append(part_path)
+            cv = Converter(pdf_path)
+            try:
+                cv.convert(part_path, start=start, end=end)
+            finally:
+                cv.close()
+            log(f"pdf2docx converted pages {start + 1}-{end} of {page_count}")
+        _merge_docx_files(part_paths, docx_path)
+    finally:
+        for part_path in part_paths:
+            if os.path.exists(part_path):
+                try:
+                    os.remove(part_path)
+                except Exception:
+                    pass
+
 def pdf_to_docx(pdf_path: str, docx_path: str) -> None:
     # Convert a PDF file to a Word (.docx) file using Microsoft Word automation (if available),
     # otherwise falls back to pdf2docx library. Logs all major events.
     try:
-        pythoncom.CoInitialize()
-        word = win32com.client.Dispatch("Word.Application")
-        word.Visible = False
         pdf_path = os.path.normpath(os.path.abspath(pdf_path))
         docx_path = os.path.normpath(os.path.abspath(docx_path))
-        try:
-            doc = word.Documents.Open(pdf_path)
-            doc.SaveAs(docx_path, FileFormat=16)  # 16 = wdFormatDocumentDefault (docx)
-            doc.Close()
-        finally:
-            word.Quit()
+        _word_save_as(pdf_path, docx_path, 16)  # 16 = wdFormatDocumentDefault (docx)
         log(f"Converted PDF to DOCX using Word: {docx_path}")
     except Exception as e:
         log(f"Word automation failed: {e}. Falling back to pdf2docx for conversion.")
-        from pdf2docx import Converter
-        cv = Converter(pdf_path)
-        cv.convert(docx_path, start=0, end=None)
-        cv.close()
+        _pdf2docx_convert(pdf_path, docx_path)
         log(f"Converted PDF to DOCX using pdf2docx: {docx_path}")
 
 
 def preprocess_docx(docx_path: str) -> None:
     # Preprocess the docx file in-place: removes images, numbers, dashes, phone numbers, emails, and paragraph numbers.
     doc = Document(docx_path)
-    for shape in doc.inline_shapes:
-        shape._inline.getparent().remove(shape._inline)
-    for p in doc.paragraphs:
-        for run in p.runs:
-            if hasattr(run, 'element') and hasattr(run.element, 'xpath'):
-                for drawing in run.element.xpath('.//w:drawing'):
-                    parent = drawing.getparent()
-                    try:
-                        if parent is not None:
-                            parent.remove(drawing)
-                    except ValueError:
-                        log("Warning: drawing element is not a child of its parent, skipping removal.")
-    num_in_brackets = re.compile(r'\[\s*\d+\s*\]')
-    hanging_dash = re.compile(r' - ')
-    phone = re.compile(r'\b\+?\d[\d\s\-]{7,}\d\b')
-    email = re.compile(r'[\w\.-]+@[\w\.-]+')
-    para_number = re.compile(r'^(\(?[a-zA-Z0-9]+\)?[\.|\)]\s*)')
-    for p in doc.paragraphs:
-        text = p.text
-        text = num_in_brackets.sub('', text)
-        text = hanging_dash.sub(' ', text)
-        text = phone.sub('', text)
-        text = email.sub('', text)
-        text = para_number.sub('', text)
-        p.text = text.strip()
+    # Drop every <w:drawing> (inline and floating images) in one pass over the body XML
+    for drawing in list(doc.element.body.iter(qn('w:drawing'))):
+        drawing.getparent().remove(drawing)
+    # Work on the raw <w:p> elements (the same set as doc.paragraphs) to avoid python-docx wrappers
+    paragraphs = list(doc.element.body.iterchildren(_W_P))
+    for p in paragraphs:
+        _set_paragraph_text(p, _clean_paragraph_text(_paragraph_text(p)))
     doc.save(docx_path)
     log(f"Preprocessed DOCX: {docx_path}")
 
@@ -172,33 +487,85 @@ def process_pdf(pdf_path: str, temp_dir=None) -> str:
     preprocess_docx(docx_path)
     log(f"Processed PDF to DOCX: {docx_path}")
     return docx_path
+
 def docx_to_txt(docx_path, txt_path=None):
     # Convert a DOCX file to plain TXT (one paragraph per line).
-    doc = Document(docx_path)
-    lines = [p.text.strip() for p in doc.paragraphs if p.text.strip()]
-    txt_content = '\n'.join(lines)
+    lines = (t for t in (p.strip() for p in iter_docx_paragraphs(docx_path)) if t)
     if txt_path:
-        with open(txt_path, 'w', encoding='utf-8') as f:
-            f.write(txt_content)
+        # Stream paragraphs to disk instead of building the whole text first
+        with open(txt_path, 'w', encoding='utf-8', buffering=1 << 20) as f:
+            f.writelines(line if i == 0 else '\n' + line for i, line in enumerate(lines))
         log(f"Converted DOCX to TXT: {txt_path}")
         return txt_path
-    return txt_content
+    return '\n'.join(lines)
 
 def rtf_to_txt(rtf_path, txt_path=None):
     # Convert RTF to DOCX, then to TXT.
     docx_path = convert_rtf_to_docx(rtf_path)
     return docx_to_txt(docx_path, txt_path)
 
+def _read_text_file(path):
+    # Decode a UTF-8 text file straight from a memory map, skipping the intermediate bytes copy
+    # and the incremental decoder of text-mode reads. Newlines are normalised like text mode.
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return ''
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+            text = str(view, 'utf-8')
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text
+
+# Extracted document text keyed by a hash of the source file, so reprocessing the same document
+# (e.g. with another voice or model) skips conversion and DOCX parsing. Bump the version when
+# extraction or preprocessing changes.
+DOC_TEXT_CACHE_DIR = Path("~/.cache/legaltts/doctext").expanduser()
+DOC_TEXT_CACHE_VERSION = "1"
+
+def _doc_text_cache_key(path):
+    digest = hashlib.sha256(DOC_TEXT_CACHE_VERSION.encode('utf-8'))
+    digest.update(os.path.splitext(path)[1].lower().encode('utf-8'))
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _read_cached_doc_text(key):
+    try:
+        return (DOC_TEXT_CACHE_DIR / f"{key}.txt").read_text(encoding='utf-8')
+    except OSError:
+        return None
+
+def _write_cached_doc_text(key, text):
+    # Write to a temporary name first so a concurrent reader never sees a partial file
+    try:
+        DOC_TEXT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        partial = DOC_TEXT_CACHE_DIR / f"{key}.{os.getpid()}.partial"
+        partial.write_text(text, encoding='utf-8')
+        os.replace(partial, DOC_TEXT_CACHE_DIR / f"{key}.txt")
+    except OSError as e:
+        log(f"Could not cache document text: {e}")
+
 def ensure_ollama_text(input_path):
     # For Ollama: if TXT, read and return text. If PDF/RTF, convert to DOCX, extract text. If DOCX, extract text.
+    # Extracted DOCX/RTF/PDF text is cached by source file content.
     ext = os.path.splitext(input_path)[1].strip().lower()
     if ext == '.txt':
-        with open(input_path, 'r', encoding='utf-8') as f:
-            return f.read()
-    elif ext == '.docx':
-        return extract_text_from_docx(input_path)
-    elif ext == '.rtf' or ext == '.pdf':
-        docx_path = convert_to_docx(input_path)
-        return extract_text_from_docx(docx_path)
+        return _read_text_file(input_path)
+    elif ext in ('.docx', '.rtf', '.pdf'):
+        key = _doc_text_cache_key(input_path)
+        text = _read_cached_doc_text(key)
+        if text is not None:
+            log(f"Using cached document text for {input_path}")
+            return text
+        if ext == '.docx':
+            text = extract_text_from_docx(input_path)
+        else:
+            docx_path = convert_to_docx(input_path)
+            text = extract_text_from_docx(docx_path)
+        # Extraction returns "" on failure; only cache real results
+        if text:
+            _write_cached_doc_text(key, text)
+        return text
     else:
         raise ValueError(f"Unsupported file type for Ollama: {input_path} (extension: '{ext}')")
\ No newline at end of file
@@ -5,10 +5,16 @@
 # handling both file and text inputs.
 # ============================================================================
 
+import io
 import os
+import functools
+import hashlib
+from pathlib import Path
 import google.generativeai as genai
 import pythoncom
 import tempfile
+import threading
+import time
 from docx2pdf import convert as docx2pdf_convert
 try:
     import pypandoc
@@ -17,26 +23,207 @@ except Exception:
 from dotenv import load_dotenv
 from Core.voice_assignment import assign_voices_to_chunks
 from Core.constants import MAX_CHUNK_LENGTH
+from Core.doc_utils import docx_to_pdf
+from Core.llm_handler import log
 
 # Load environment variables once
 load_dotenv()
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 
-def process_gemini_request(input_path, input_text, model_name, system_prompt, voice_name, all_voices, max_length=MAX_CHUNK_LENGTH):
+_configured = False
+_configure_lock = threading.Lock()
+
+def _ensure_configured():
+    # Configure the genai client once per process rather than on every request.
+    global _configured
+    if _configured:
+        return
+    with _configure_lock:
+        if not _configured:
+            genai.configure(api_key=GOOGLE_API_KEY)
+            _configured = True
+
+@functools.lru_cache(maxsize=16)
+def _get_model(model_name, system_prompt):
+    # GenerativeModel holds no per-request state, so one instance per (model, prompt) is reused.
+    return genai.GenerativeModel(model_name=model_name, system_instruction=system_prompt)
+
+# Converted upload PDFs are kept here, named by the SHA-256 of the source file, so the same
+# document is only pushed through Word once. Bump the version to invalidate old conversions.
+# Least recently used PDFs are evicted once the cache exceeds LTTS_PDF_CACHE_MAX_MB.
+PDF_CACHE_DIR = os.path.join(tempfile.gettempdir(), "legaltts_pdfcache")
+PDF_CACHE_VERSION = "1"
+PDF_CACHE_MAX_MB = int(os.getenv("LTTS_PDF_CACHE_MAX_MB", "512"))
+_pdf_cache_lock = threading.Lock()
+
+# Gemini keeps uploaded files for 48 hours; remember what was uploaded (PDF hash -> file name) so a
+# re-run on the same document can skip the upload. The mapping is also kept on disk, one small file
+# per hash, so it survives restarts; a stale entry is dropped when get_file no longer finds it.
+_uploaded_files = {}
+UPLOAD_CACHE_DIR = Path("~/.cache/legaltts/gemini_uploads").expanduser()
+UPLOAD_ATTEMPTS = 3
+
+def _lookup_upload(pdf_digest):
+    name = _uploaded_files.get(pdf_digest)
+    if name is None:
+        try:
+            name = (UPLOAD_CACHE_DIR / pdf_digest).read_text(encoding="utf-8").strip() or None
+        except OSError:
+            name = None
+    return name
+
+def _remember_upload(pdf_digest, name):
+    _uploaded_files[pdf_digest] = name
+    try:
+        UPLOAD_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        partial = UPLOAD_CACHE_DIR / f"{pdf_digest}.{os.getpid()}.partial"
+        partial.write_text(name, encoding="utf-8")
+        os.replace(partial, UPLOAD_CACHE_DIR / pdf_digest)
+    except OSError as e:
+        log(f"Could not record Gemini upload: {e}")
+
+def _forget_upload(pdf_digest):
+    _uploaded_files.pop(pdf_digest, None)
+    try:
+        os.remove(UPLOAD_CACHE_DIR / pdf_digest)
+    except OSError:
+        pass
+
+def _file_sha256(path, salt=""):
+    digest = hashlib.sha256(salt.encode("utf-8"))
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _pdf_cache_path(source_path):
+    # Content-addressed cache location for the upload PDF generated from source_path.
+    return os.path.join(PDF_CACHE_DIR, f"{_file_sha256(source_path, PDF_CACHE_VERSION)}.pdf")
+
+def _use_cached_pdf(pdf_path):
+    # True on a cache hit; the mtime is refreshed so eviction sees the entry as recently used.
+    try:
+        os.utime(pdf_path)
+        return True
+    except OSError:
+        return False
+
+def _evict_pdf_cache(keep):
+    # Drop least recently used PDFs beyond PDF_CACHE_MAX_MB; keep is the PDF about to be uploaded.
+    limit = PDF_CACHE_MAX_MB * 1024 * 1024
+    with _pdf_cache_lock:
+        entries = []
+        total = 0
+        with os.scandir(PDF_CACHE_DIR) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.endswith(".pdf") and not entry.name.endswith(".partial.pdf"):
+                    st = entry.stat()
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+                    total += st.st_size
+        if total <= limit:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            if total <= limit:
+                break
+
+def _upload_pdf(pdf_bytes, pdf_digest, display_name):
+    # Upload the PDF bytes to Gemini, reusing an earlier upload of the same bytes while it is
+    # still active. Returns (file, reused).
+    name = _lookup_upload(pdf_digest)
+    if name:
+        try:
+            uploaded_file = genai.get_file(name)
+            if getattr(getattr(uploaded_file, "state", None), "name", "ACTIVE") == "ACTIVE":
+                return uploaded_file, True
+        except Exception:
+            pass
+        _forget_upload(pdf_digest)
+    for attempt in range(UPLOAD_ATTEMPTS):
+        try:
+            uploaded_file = genai.upload_file(path=io.BytesIO(pdf_bytes), mime_type='application/pdf', display_name=display_name)
+            break
+        except Exception as e:
+            if attempt == UPLOAD_ATTEMPTS - 1:
+                raise
+            log(f"Gemini upload attempt {attempt + 1} failed ({e}); retrying in {2 ** attempt}s.")
+            time.sleep(2 ** attempt)
+    _remember_upload(pdf_digest, uploaded_file.name)
+    return uploaded_file, False
+
+def _convert_docx_to_cached_pdf(docx_path, cached_pdf):
+    # Convert into a temporary name first and rename, so an interrupted conversion never
+    # leaves a truncated PDF behind under the cache key.
+    os.makedirs(PDF_CACHE_DIR, exist_ok=True)
+    partial_pdf = f"{os.path.splitext(cached_pdf)[0]}.{os.getpid()}.partial.pdf"
+    try:
+        try:
+            docx_to_pdf(docx_path, partial_pdf)
+        except Exception as e:
+            log(f"Word conversion failed ({e}); retrying with docx2pdf.")
+            pythoncom.CoInitialize()
+            docx2pdf_convert(docx_path, partial_pdf)
+        os.replace(partial_pdf, cached_pdf)
+        try:
+            _evict_pdf_cache(keep=cached_pdf)
+        except OSError as e:
+            log(f"Could not evict cached PDFs: {e}")
+    finally:
+        if os.path.exists(partial_pdf):
+            try:
+                os.remove(partial_pdf)
+            except Exception:
+                pass
+
+# Gemini responses keyed by SHA-256 of (model, system prompt, input), so re-running the same
+# document with the same prompt (e.g. to try another voice) skips the API call entirely.
+RESPONSE_CACHE_DIR = Path("~/.cache/legaltts/gemini").expanduser()
+
+def _response_cache_key(model_name, system_prompt, pdf_digest=None, input_text=None):
+    salt = f"{model_name}\0{system_prompt}\0"
+    payload = pdf_digest if pdf_digest else input_text
+    return hashlib.sha256((salt + payload).encode("utf-8")).hexdigest()
+
+def _read_cached_response(key):
+    try:
+        return (RESPONSE_CACHE_DIR / f"{key}.txt").read_text(encoding="utf-8")
+    except OSError:
+        return None
+
+def _write_cached_response(key, llm_response):
+    # Write-then-rename so a crash never leaves a partial response under the key
+    try:
+        RESPONSE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        partial = RESPONSE_CACHE_DIR / f"{key}.{os.getpid()}.partial"
+        partial.write_text(llm_response, encoding="utf-8")
+        os.replace(partial, RESPONSE_CACHE_DIR / f"{key}.txt")
+    except OSError as e:
+        log(f"Could not cache Gemini response: {e}")
+
+def process_gemini_request(input_path, input_text, model_name, system_prompt, voice_name, all_voices, max_length=MAX_CHUNK_LENGTH, ignore_cache=False):
     """
     Unified function to handle both file and text requests to the Gemini API.
     Yields log messages and returns the final processed audio chunks.
+    Responses are cached on disk per (model, prompt, input); pass ignore_cache=True to force a new request.
     """
     if not GOOGLE_API_KEY:
         yield "Gemini API key not set in environment. Aborting."
         return [], None
     
-    genai.configure(api_key=GOOGLE_API_KEY)
-    model = genai.GenerativeModel(model_name=model_name, system_instruction=system_prompt)
+    _ensure_configured()
+    model = _get_model(model_name, system_prompt)
 
     prompt_parts = []
     pdf_path = None
     temp_dir = None
+    cached_response = None
 
     try:
         # --- 1. Prepare Input (File or Text) ---
@@ -52,64 +239,80 @@ def process_gemini_request(input_path, input_text, model_name, system_prompt, vo
 
             # DOCX -> PDF via Word automation/docx2pdf
             elif ext == '.docx':
-                base = os.path.splitext(os.path.basename(input_path))[0]
-                pdf_path = os.path.join(temp_dir, f"{base}_gemini_upload.pdf")
-                yield f"Converting DOCX to PDF for Gemini upload: {os.path.basename(input_path)} -> {os.path.basename(pdf_path)}"
-                try:
-                    pythoncom.CoInitialize()
-                    docx2pdf_convert(input_path, pdf_path)
-                except Exception as e:
-                    yield f"DOCX to PDF conversion failed: {e}"
-                    yield [], None
-                    return
+                pdf_path = _pdf_cache_path(input_path)
+                if _use_cached_pdf(pdf_path):
+                    yield f"Using cached PDF for Gemini upload: {os.path.basename(input_path)}"
+                else:
+                    yield f"Converting DOCX to PDF for Gemini upload: {os.path.basename(input_path)} -> {os.path.basename(pdf_path)}"
+                    try:
+                        _convert_docx_to_cached_pdf(input_path, pdf_path)
+                    except Exception as e:
+                        yield f"DOCX to PDF conversion failed: {e}"
+                        yield [], None
+                        return
 
             # RTF -> DOCX (pypandoc) -> PDF
             elif ext == '.rtf':
-                if not pypandoc:
-                    yield "pypandoc is required to convert RTF to DOCX before PDF upload. Aborting."
-                    yield [], None
-                    return
-                base = os.path.splitext(os.path.basename(input_path))[0]
-                docx_temp = os.path.join(temp_dir, f"{base}_temp.docx")
-                pdf_path = os.path.join(temp_dir, f"{base}_gemini_upload.pdf")
-                yield f"Converting RTF to DOCX (temp): {os.path.basename(input_path)} -> {os.path.basename(docx_temp)}"
-                try:
-                    pypandoc.convert_file(input_path, 'docx', outputfile=docx_temp)
-                except Exception as e:
-                    yield f"RTF to DOCX conversion failed: {e}"
-                    yield [], None
-                    return
-                yield f"Converting DOCX to PDF for Gemini upload: {os.path.basename(docx_temp)} -> {os.path.basename(pdf_path)}"
-                try:
-                    pythoncom.CoInitialize()
-                    docx2pdf_convert(docx_temp, pdf_path)
-                except Exception as e:
-                    yield f"DOCX to PDF conversion failed: {e}"
-                    # cleanup docx_temp
-                    if os.path.exists(docx_temp):
-                        try:
-                            os.remove(docx_temp)
-                        except Exception:
-                            pass
-                    yield [], None
-                    return
+                # Keyed on the RTF itself, so a cache hit skips both pandoc and Word
+                pdf_path = _pdf_cache_path(input_path)
+                if _use_cached_pdf(pdf_path):
+                    yield f"Using cached PDF for Gemini upload: {os.path.basename(input_path)}"
+                else:
+                    if not pypandoc:
+                        yield "pypandoc is required to convert RTF to DOCX before PDF upload. Aborting."
+                        yield [], None
+                        return
+                    base = os.path.splitext(os.path.basename(input_path))[0]
+                    docx_temp = os.path.join(temp_dir, f"{base}_temp.docx")
+                    yield f"Converting RTF to DOCX (temp): {os.path.basename(input_path)} -> {os.path.basename(docx_temp)}"
+                    try:
+                        pypandoc.convert_file(input_path, 'docx', outputfile=docx_temp)
+                    except Exception as e:
+                        yield f"RTF to DOCX conversion failed: {e}"
+                        yield [], None
+                        return
+                    yield f"Converting DOCX to PDF for Gemini upload: {os.path.basename(docx_temp)} -> {os.path.basename(pdf_path)}"
+                    try:
+                        _convert_docx_to_cached_pdf(docx_temp, pdf_path)
+                    except Exception as e:
+                        yield f"DOCX to PDF conversion failed: {e}"
+                        # cleanup docx_temp
+                        if os.path.exists(docx_temp):
+                            try:
+                                os.remove(docx_temp)
+                            except Exception:
+                                pass
+                        yield [], None
+                        return
 
             else:
                 yield f"Unsupported file type for Gemini upload: {ext}. Aborting."
                 yield [], None
                 return
 
+            # Read the PDF once: the same bytes feed both cache keys and the upload
+            with open(pdf_path, 'rb') as f:
+                pdf_bytes = f.read()
+            pdf_digest = hashlib.sha256(pdf_bytes).hexdigest()
+            cache_key = _response_cache_key(model_name, system_prompt, pdf_digest=pdf_digest)
+            cached_response = None if ignore_cache else _read_cached_response(cache_key)
+
             # Upload the PDF
-            try:
-                yield f"Uploading file to Gemini: {os.path.basename(pdf_path)}"
-                uploaded_file = genai.upload_file(path=pdf_path, mime_type='application/pdf')
-                prompt_parts.append(uploaded_file)
-            except Exception as e:
-                yield f"Failed to upload file to Gemini: {e}"
-                yield [], None
-                return
+            if cached_response is None:
+                try:
+                    yield f"Uploading file to Gemini: {os.path.basename(pdf_path)}"
+                    uploaded_file, reused = _upload_pdf(pdf_bytes, pdf_digest, os.path.basename(pdf_path))
+                    if reused:
+                        yield f"Reusing earlier Gemini upload: {uploaded_file.name}"
+                    prompt_parts.append(uploaded_file)
+                except Exception as e:
+                    yield f"Failed to upload file to Gemini: {e}"
+                    yield [], None
+                    return
 
         elif input_text:
+            cache_key = _response_cache_key(model_name, system_prompt, input_text=input_text)
+            cached_response = None if ignore_cache else _read_cached_response(cache_key)
             prompt_parts.append(input_text)
         else:
             yield "No input provided (either file or text). Aborting."
@@ -117,13 +320,19 @@ def process_gemini_request(input_path, input_text, model_name, system_prompt, vo
             return
 
         # --- 2. Generate Content from Gemini ---
-        yield "Sending request to Gemini model..."
-        response = model.generate_content(prompt_parts)
+        if cached_response is not None:
+            yield "Using cached Gemini response for this input and prompt."
+            llm_response = cached_response
+        else:
+            yield "Sending request to Gemini model..."
+            response = model.generate_content(prompt_parts)
 
-        # --- 3. Parse Response and Process for TTS ---
-        llm_response = getattr(response, 'text', '')
-        if isinstance(llm_response, str):
-            llm_response = llm_response.strip()
+            # --- 3. Parse Response and Process for TTS ---
+            llm_response = getattr(response, 'text', '')
+            if isinstance(llm_response, str):
+                llm_response = llm_response.strip()
+            if llm_response:
+                _write_cached_response(cache_key, llm_response)
 
         if not llm_response:
             yield "Gemini LLM response was empty."
@@ -152,8 +361,4 @@ def process_gemini_request(input_path, input_text, model_name, system_prompt, vo
                 os.remove(docx_temp)
         except Exception:
             pass
-        try:
-            if 'pdf_path' in locals() and pdf_path and os.path.exists(pdf_path) and pdf_path != input_path:
-                os.remove(pdf_path)
-        except Exception:
-            pass
\ No newline at end of file
+        # Upload PDFs live in PDF_CACHE_DIR and are kept for the next run of the same document
\ No newline at end of file
@@ -10,38 +10,327 @@
 
 
 import os
+import time
+import atexit
+import logging
+import queue
+import sqlite3
+import hashlib
+import threading
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import ollama
 from dotenv import load_dotenv
 
 load_dotenv()
 OLLAMA_API_URL = os.getenv('OLLAMA_API_URL', 'http://localhost:11434')
 
-def log(msg, include_ollama_status=False):
+# Shared HTTP session so repeated status probes reuse a kept-alive connection. Server errors are
+# retried with backoff; connection failures are not, so a stopped Ollama is reported immediately.
+_http_session = requests.Session()
+_http_adapter = HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=16,
+    max_retries=Retry(total=3, connect=0, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504]),
+)
+_http_session.mount('http://', _http_adapter)
+_http_session.mount('https://', _http_adapter)
+
+LOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'logs', 'llm_status.log')
+# Messages below this level are dropped before formatting, e.g. LTTS_LOG_LEVEL=WARNING for long runs
+LOG_LEVEL = logging.getLevelName(os.getenv('LTTS_LOG_LEVEL', 'INFO').upper())
+if not isinstance(LOG_LEVEL, int):
+    LOG_LEVEL = logging.INFO
+OLLAMA_STATUS_TTL = 10  # seconds a /api/tags result is reused for status log lines
+
+_log_file = None
+_log_lock = threading.Lock()
+_ollama_status_cache = (0.0, None)
+
+def _get_log_file():
+    # Open the status log once (line-buffered append) and keep it for the life of the process.
+    global _log_file
+    if _log_file is None:
+        os.makedirs(os.path.dirname(LOG_PATH), exist_ok=True)
+        _log_file = open(LOG_PATH, 'a', encoding='utf-8', buffering=1)
+        atexit.register(_log_file.close)
+    return _log_file
+
+def _ollama_status():
+    # Query Ollama's /api/tags endpoint for available models and status, at most once per OLLAMA_STATUS_TTL.
+    global _ollama_status_cache
+    checked_at, status = _ollama_status_cache
+    if status is not None and time.monotonic() - checked_at < OLLAMA_STATUS_TTL:
+        return status
+    try:
+        tags_url = f"{OLLAMA_API_URL.rstrip('/')}/api/tags"
+        resp = _http_session.get(tags_url, timeout=2)
+        if resp.ok:
+            data = resp.json()
+            tags = data.get('models', [])
+            tag_names = ', '.join([t.get('name', '') for t in tags])
+            status = f" | Ollama models: {tag_names}"
+        else:
+            status = " | Ollama status: unavailable"
+    except Exception as e:
+        status = f" | Ollama status error: {e}"
+    _ollama_status_cache = (time.monotonic(), status)
+    return status
+
+def log_enabled(level):
+    # True if messages at this logging level are written (LTTS_LOG_LEVEL, default INFO).
+    return level >= LOG_LEVEL
+
+def log(msg, *args, include_ollama_status=False, level=logging.INFO):
     # Log function for Gradio and CLI: appends messages to a log file for persistent status tracking.
+    # printf-style args are only formatted when the level is enabled, so hot loops can pass them lazily.
     # Optionally queries Ollama for model status and appends this info to the log.
-    log_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'logs', 'llm_status.log')
-    os.makedirs(os.path.dirname(log_path), exist_ok=True)
-    log_entry = msg
+    if level < LOG_LEVEL:
+        return
+    log_entry = msg % args if args else msg
     if include_ollama_status:
+        log_entry += _ollama_status()
+    with _log_lock:
+        _get_log_file().write(log_entry + '\n')
+
+# Exact-match cache of Ollama responses keyed by (model, system prompt, text). Re-running a document
+# with the same prompt (e.g. to try another voice) returns the stored response instead of regenerating.
+LLM_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'logs', 'llm_cache.sqlite')
+_llm_cache_lock = threading.Lock()
+
+def _llm_cache_key(model_name, system_prompt, text):
+    return hashlib.sha256(f"{model_name}\0{system_prompt}\0{text}".encode('utf-8')).hexdigest()
+
+def _llm_cache_connect():
+    os.makedirs(os.path.dirname(LLM_CACHE_PATH), exist_ok=True)
+    conn = sqlite3.connect(LLM_CACHE_PATH, timeout=5)
+    conn.execute("CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, response TEXT, ts INTEGER)")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS llm_semantic_cache "
+        "(key TEXT PRIMARY KEY, scope TEXT, length INTEGER, embedding BLOB, response TEXT, ts INTEGER)"
+    )
+    return conn
+
+def _llm_cache_get(key):
+    try:
+        with _llm_cache_lock:
+            conn = _llm_cache_connect()
+            try:
+                row = conn.execute("SELECT response FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            finally:
+                conn.close()
+        return row[0] if row else None
+    except sqlite3.Error as e:
+        log(f"LLM cache lookup failed: {e}")
+        return None
+
+def _llm_cache_put(key, response):
+    try:
+        with _llm_cache_lock:
+            conn = _llm_cache_connect()
+            try:
+                with conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO llm_cache (key, response, ts) VALUES (?, ?, ?)",
+                        (key, response, int(time.time())),
+                    )
+            finally:
+                conn.close()
+    except sqlite3.Error as e:
+        log(f"LLM cache write failed: {e}")
+
+# Optional near-duplicate layer behind the exact cache, off by default. Set LTTS_LLM_SEMANTIC_CACHE to
+# an Ollama embedding model (e.g. nomic-embed-text) to reuse a response for a document whose embedding
+# is within LTTS_LLM_SEMANTIC_THRESHOLD cosine similarity of an earlier one. Matches must share the
+# model and system prompt and be within 2% in length, and entries expire after LTTS_LLM_SEMANTIC_TTL_DAYS.
+LLM_SEMANTIC_MODEL = os.getenv('LTTS_LLM_SEMANTIC_CACHE', '')
+LLM_SEMANTIC_THRESHOLD = float(os.getenv('LTTS_LLM_SEMANTIC_THRESHOLD', '0.97'))
+LLM_SEMANTIC_TTL = int(os.getenv('LTTS_LLM_SEMANTIC_TTL_DAYS', '30')) * 86400
+
+def _semantic_scope(model_name, system_prompt):
+    return hashlib.sha256(f"{model_name}\0{system_prompt}".encode('utf-8')).hexdigest()
+
+def _embed(text):
+    # L2-normalised float32 embedding from Ollama, so a dot product is the cosine similarity.
+    import numpy as np
+    vec = np.asarray(ollama.embeddings(model=LLM_SEMANTIC_MODEL, prompt=text)['embedding'], dtype=np.float32)
+    norm = float(np.linalg.norm(vec))
+    return vec / norm if norm else vec
+
+def _llm_semantic_get(scope, text, vec):
+    import numpy as np
+    try:
+        with _llm_cache_lock:
+            conn = _llm_cache_connect()
+            try:
+                rows = conn.execute(
+                    "SELECT embedding, response FROM llm_semantic_cache "
+                    "WHERE scope = ? AND ts >= ? AND length BETWEEN ? AND ?",
+                    (scope, int(time.time()) - LLM_SEMANTIC_TTL, int(len(text) * 0.98), int(len(text) * 1.02) + 1),
+                ).fetchall()
+            finally:
+                conn.close()
+    except sqlite3.Error as e:
+        log(f"LLM semantic cache lookup failed: {e}")
+        return None
+    rows = [(emb, response) for emb, response in rows if len(emb) == vec.nbytes]
+    if not rows:
+        return None
+    matrix = np.frombuffer(b''.join(emb for emb, _ in rows), dtype=np.float32).reshape(len(rows), -1)
+    scores = matrix @ vec
+    best = int(scores.argmax())
+    if scores[best] < LLM_SEMANTIC_THRESHOLD:
+        return None
+    return rows[best][1]
+
+def _llm_semantic_put(key, scope, text, vec, response):
+    try:
+        with _llm_cache_lock:
+            conn = _llm_cache_connect()
+            try:
+                with conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO llm_semantic_cache (key, scope, length, embedding, response, ts) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (key, scope, len(text), vec.tobytes(), response, int(time.time())),
+                    )
+            finally:
+                conn.close()
+    except sqlite3.Error as e:
+        log(f"LLM semantic cache write failed: {e}")
+
+_STREAM_END = object()
+
+# Chunks the reader thread may get ahead of the consumer before it waits
+READ_AHEAD_MAX_CHUNKS = 1024
+
+def _read_ahead(stream):
+    # Drain an Ollama stream on a background thread so token generation is never held up by a slow
+    # consumer; items (or the exception that ended the stream) are handed over through a bounded queue.
+    # When the consumer stops early (generator closed, job cancelled, later stage failed), the reader
+    # stops at its next chunk and closes the stream on its own thread, which drops the connection
+    # and ends generation on the Ollama server.
+    items = queue.Queue(maxsize=READ_AHEAD_MAX_CHUNKS)
+    stop = threading.Event()
+
+    def _put(item):
+        # Wait while the queue is full, but give up once the consumer has gone away
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _reader():
         try:
-            # Query Ollama's /api/tags endpoint for available models and status
-            tags_url = f"{OLLAMA_API_URL.rstrip('/')}/api/tags"
-            resp = requests.get(tags_url, timeout=2)
-            if resp.ok:
-                data = resp.json()
-                tags = data.get('models', [])
-                tag_names = ', '.join([t.get('name', '') for t in tags])
-                log_entry += f" | Ollama models: {tag_names}"
-            else:
-                log_entry += " | Ollama status: unavailable"
-        except Exception as e:
-            log_entry += f" | Ollama status error: {e}"
-    with open(log_path, 'a', encoding='utf-8') as f:
-        f.write(log_entry + '\n')
+            for chunk in stream:
+                if not _put(chunk):
+                    break
+        except BaseException as e:
+            _put(e)
+        finally:
+            close = getattr(stream, 'close', None)
+            if close:
+                try:
+                    close()
+                except Exception:
+                    pass
+            _put(_STREAM_END)
+
+    threading.Thread(target=_reader, name="ollama-stream", daemon=True).start()
+    try:
+        while True:
+            item = items.get()
+            if item is _STREAM_END:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
+# How long Ollama keeps a model loaded after a request (e.g. "30m", "-1" for always), set with
+# LTTS_OLLAMA_KEEP_ALIVE. Ollama tokenizes prompts server-side and reuses the cached prefix of the
+# last prompt while the model stays loaded, so keeping it resident lets the next job skip re-encoding the
+# shared system prompt. Unset leaves Ollama's default (5 minutes).
+OLLAMA_KEEP_ALIVE = os.getenv('LTTS_OLLAMA_KEEP_ALIVE') or None
+
+def _chat_stream(model_name, messages):
+    if OLLAMA_KEEP_ALIVE is None:
+        return ollama.chat(model=model_name, messages=messages, stream=True)
+    return ollama.chat(model=model_name, messages=messages, stream=True, keep_alive=OLLAMA_KEEP_ALIVE)
+
+# Fast fallback model raced against the selected one when hedging is requested
+LLM_HEDGE_MODEL = os.getenv('LTTS_LLM_HEDGE_MODEL', 'gemma3:1b')
+
+def _first_stream(model_names, messages):
+    # Start one streaming chat per model and keep whichever delivers its first chunk first.
+    # The other readers stop at their next chunk and close their stream, which drops the connection
+    # and ends generation on the Ollama server. Returns (winning model name, chunk iterator).
+    items = queue.SimpleQueue()
+    stop = [threading.Event() for _ in model_names]
+
+    def _reader(idx, model):
+        try:
+            stream = _chat_stream(model, messages)
+            try:
+                for chunk in stream:
+                    if stop[idx].is_set():
+                        break
+                    items.put((idx, chunk))
+            finally:
+                close = getattr(stream, 'close', None)
+                if close:
+                    close()
+        except BaseException as e:
+            items.put((idx, e))
+        finally:
+            items.put((idx, _STREAM_END))
+
+    for idx, model in enumerate(model_names):
+        threading.Thread(target=_reader, args=(idx, model), name="ollama-hedge", daemon=True).start()
 
-def get_llm_response(model_name, system_prompt, text, progress_callback=None, log_callback=None):
+    # Wait for the first chunk; a backend that fails before producing one drops out of the race
+    ended, errors = 0, []
+    while True:
+        idx, item = items.get()
+        if item is _STREAM_END:
+            ended += 1
+            if ended == len(model_names):
+                raise errors[0] if errors else RuntimeError("No response from any Ollama model")
+        elif isinstance(item, BaseException):
+            errors.append(item)
+        else:
+            winner, first = idx, item
+            break
+    for idx, event in enumerate(stop):
+        if idx != winner:
+            event.set()
+
+    def _winner_stream():
+        try:
+            yield first
+            while True:
+                idx, item = items.get()
+                if idx != winner:
+                    continue
+                if item is _STREAM_END:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            # Abandoned early: the winning reader stops at its next chunk as well
+            stop[winner].set()
+
+    return model_names[winner], _winner_stream()
+
+def get_llm_response(model_name, system_prompt, text, progress_callback=None, log_callback=None, use_cache=True, hedge_model=None):
     # Generator for Gradio: yields log/progress updates and streamed LLM response chunks.
+    # With hedge_model, that model is raced against model_name and the first to respond is used.
     def _log(msg):
         log_msg = f"LLM Logs: {msg}"
         if log_callback:
@@ -63,25 +352,78 @@ def get_llm_response(model_name, system_prompt, text, progress_callback=None, lo
         yield text
         return
 
-    yield from _log(f"Sending text to Ollama model: {model_name}")
+    cache_key = _llm_cache_key(model_name, system_prompt, text)
+    if use_cache:
+        cached = _llm_cache_get(cache_key)
+        if cached is not None:
+            yield from _log(f"Using cached response from Ollama model: {model_name}")
+            if progress_callback:
+                progress_callback(100)
+            yield cached
+            return
+
+    semantic_vec = None
+    if use_cache and LLM_SEMANTIC_MODEL:
+        semantic_scope = _semantic_scope(model_name, system_prompt)
+        try:
+            semantic_vec = _embed(text)
+        except Exception as e:
+            yield from _log(f"Semantic cache unavailable: {e}")
+        if semantic_vec is not None:
+            cached = _llm_semantic_get(semantic_scope, text, semantic_vec)
+            if cached is not None:
+                yield from _log(f"Using cached response for a near-identical document from Ollama model: {model_name}")
+                if progress_callback:
+                    progress_callback(100)
+                yield cached
+                return
+
+    if hedge_model == model_name:
+        hedge_model = None
+    if hedge_model:
+        yield from _log(f"Sending text to Ollama models: {model_name} (hedged with {hedge_model})")
+    else:
+        yield from _log(f"Sending text to Ollama model: {model_name}")
     messages = [
         {'role': 'system', 'content': system_prompt},
         {'role': 'user', 'content': text}
     ]
+    stream = None
     try:
-        stream = ollama.chat(model=model_name, messages=messages, stream=True)
-        llm_response = ""
+        if hedge_model:
+            responding_model, stream = _first_stream([model_name, hedge_model], messages)
+            yield from _log(f"First response from Ollama model: {responding_model}")
+            if responding_model != model_name:
+                # Cache the answer under the model that actually wrote it
+                cache_key = _llm_cache_key(responding_model, system_prompt, text)
+                semantic_vec = None
+        else:
+            stream = _read_ahead(_chat_stream(model_name, messages))
+        # Collect the pieces and join once at the end; += would recopy the whole response per chunk
+        response_parts = []
+        append_part = response_parts.append
         i = 0
         for chunk in stream:
             content = chunk['message']['content']
-            llm_response += content
-            i += 1
-            if progress_callback:
-                progress_callback(min(i, 99))
+            append_part(content)
+            # Progress is min(chunks, 99): only report while it still changes, not once per token
+            if progress_callback and i < 99:
+                i += 1
+                progress_callback(i)
             # Yield each chunk as it arrives for Gradio streaming
             yield content
         if progress_callback:
             progress_callback(100)
+        llm_response = ''.join(response_parts)
+        if llm_response:
+            _llm_cache_put(cache_key, llm_response)
+            if semantic_vec is not None:
+                _llm_semantic_put(cache_key, semantic_scope, text, semantic_vec, llm_response)
         yield from _log("AI response received from Ollama.")
     except Exception as e:
         yield from _log(f"Error communicating with Ollama: {e}")
+    finally:
+        # Closing the reader right away (rather than at garbage collection) stops the Ollama
+        # stream when this generator is abandoned before the response is complete
+        if stream is not None:
+            stream.close()
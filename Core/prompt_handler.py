@@ -4,6 +4,26 @@
 # Provides functions to load prompt text for LLMs, supporting both file-based and custom (string) prompts.
 # Used by the Gradio pipeline to retrieve the system prompt for AI processing.
 import os
+import re
+import logging
+import functools
+from Core.constants import USER_CONSTANTS
+
+logger = logging.getLogger("PromptHandler")
+
+def log(msg):
+    logger.info(msg)
+
+_CONST_TAG_RE = re.compile(r"{([A-Za-z0-9_]+)}")
+
+# USER_CONSTANTS values are resolved once per process, so the substituted prompt only
+# depends on the prompt text and can be reused across chunks and runs.
+@functools.lru_cache(maxsize=32)
+def _render_prompt(prompt_text):
+    def replace_tag(match):
+        key = match.group(1)
+        return str(USER_CONSTANTS.get(key, match.group(0)))
+    return _CONST_TAG_RE.sub(replace_tag, prompt_text)
 
 # Returns (system_prompt, status_message)
 def get_system_prompt(system_prompt_key, prompt_options, prompt_text):
@@ -12,22 +32,15 @@ def get_system_prompt(system_prompt_key, prompt_options, prompt_text):
     # a) The user's custom prompt (if system_prompt_key == '__custom__')
     # b) The possibly modified template prompt (if system_prompt_key is a template name)
     # Returns (system_prompt, status_message)
-    import logging
-    logger = logging.getLogger("PromptHandler")
-    def log(msg):
-        logger.info(msg)
 
     # Always use the prompt text from the UI
     system_prompt = prompt_text.strip() if prompt_text else ""
 
     # Replace {ConstantName} tags with values from USER_CONSTANTS
+    # Most prompts have no tags; skip the regex (and the cache lookup) entirely for those
     try:
-        from Core.constants import USER_CONSTANTS
-        import re
-        def replace_tag(match):
-            key = match.group(1)
-            return str(USER_CONSTANTS.get(key, match.group(0)))
-        system_prompt = re.sub(r"{([A-Za-z0-9_]+)}", replace_tag, system_prompt)
+        if "{" in system_prompt:
+            system_prompt = _render_prompt(system_prompt)
     except Exception as e:
         log(f"Prompt constant replacement error: {e}")
 
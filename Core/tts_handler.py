@@ -8,15 +8,159 @@
 
 
 import os
+import shutil
+import contextlib
 import requests
-import json
-import uuid
+from requests.adapters import HTTPAdapter
+import itertools
+import hashlib
+import threading
+import logging
+# orjson is optional; it serializes straight to bytes, so requests skips its own json encode
+try:
+    from orjson import dumps as _dumps
+except Exception:
+    import json
+
+    def _dumps(obj):
+        return json.dumps(obj).encode("utf-8")
 from dotenv import load_dotenv
 from Core.llm_handler import log
 
 load_dotenv()
 TTS_ENDPOINT = os.getenv("TTS_ENDPOINT", "http://localhost:5005/v1/audio/speech")
 
+# Concurrent requests for batch synthesis; the Orpheus server queues anything beyond its own limit
+TTS_MAX_WORKERS = int(os.getenv("TTS_MAX_WORKERS", "4"))
+
+# Shared session: keeps connections to the TTS server alive between chunks; the pool is sized
+# for the concurrent requests of batch synthesis.
+_http_session = requests.Session()
+_http_adapter = HTTPAdapter(pool_connections=8, pool_maxsize=16)
+_http_session.mount("http://", _http_adapter)
+_http_session.mount("https://", _http_adapter)
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Optional HTTP/2 transport (LTTS_TTS_HTTP2=1, needs httpx[http2]): concurrent batch requests share
+# one multiplexed connection instead of one keep-alive connection each.
+TTS_HTTP2 = os.getenv("LTTS_TTS_HTTP2", "0") == "1"
+_http2_client = None
+_http2_lock = threading.Lock()
+
+def _get_http2_client():
+    global _http2_client
+    if _http2_client is None:
+        with _http2_lock:
+            if _http2_client is None:
+                import httpx
+                _http2_client = httpx.Client(http2=True, timeout=500, limits=httpx.Limits(max_connections=16))
+    return _http2_client
+
+@contextlib.contextmanager
+def _audio_response(url, payload):
+    # Posts the TTS request and yields (content_length, iter_chunks), where iter_chunks(size)
+    # iterates the response body; content_length is 0 when the server does not send it.
+    body = _dumps(payload)
+    if TTS_HTTP2:
+        with _get_http2_client().stream("POST", url, content=body, headers=_JSON_HEADERS) as response:
+            response.raise_for_status()
+            yield int(response.headers.get("content-length", 0)), response.iter_bytes
+    else:
+        with _http_session.post(url, data=body, headers=_JSON_HEADERS, stream=True, timeout=500) as response:
+            response.raise_for_status()
+            yield int(response.headers.get("content-length", 0)), lambda size: response.iter_content(chunk_size=size)
+
+# Per-chunk WAVs are written here; resolved and created once at import
+_OUTPUTS_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "outputs"))
+os.makedirs(_OUTPUTS_DIR, exist_ok=True)
+
+# Per-chunk file names: pid + counter is unique among running processes without an RNG call per chunk.
+# next() on itertools.count is atomic, so batch threads can share it.
+_output_counter = itertools.count()
+
+def _new_output_path():
+    return os.path.join(_OUTPUTS_DIR, f"tts_{os.getpid()}_{next(_output_counter):08x}.wav")
+
+# Synthesized WAVs are kept in outputs/cache, named by a hash of everything that affects the audio,
+# so repeated text (boilerplate, re-runs) is not sent to the TTS server again. Least recently
+# used files are evicted once the cache exceeds TTS_CACHE_MAX_MB.
+TTS_CACHE_DIR = os.path.join(_OUTPUTS_DIR, "cache")
+TTS_CACHE_MAX_MB = int(os.getenv("TTS_CACHE_MAX_MB", "1024"))
+_tts_cache_lock = threading.Lock()
+
+def _tts_cache_path(payload):
+    key = f"{payload['model']}|{payload['voice']}|{payload['speed']}|{payload['input']}"
+    return os.path.join(TTS_CACHE_DIR, hashlib.sha256(key.encode("utf-8")).hexdigest() + ".wav")
+
+def _link_or_copy(src, dst):
+    # Hard link when possible (no data copy); callers delete their output files, never the cache entry
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+def _reuse_cached_speech(cache_path, output_path):
+    # Link/copy a cached WAV to output_path and mark it recently used. False on a miss, including an
+    # entry another request evicted between the lookup and the copy.
+    try:
+        _link_or_copy(cache_path, output_path)
+    except FileNotFoundError:
+        return False
+    try:
+        os.utime(cache_path)
+    except OSError:
+        pass
+    return True
+
+def _store_cached_speech(output_path, cache_path):
+    # Add a freshly synthesized WAV to the cache and trim the cache back to TTS_CACHE_MAX_MB.
+    try:
+        os.makedirs(TTS_CACHE_DIR, exist_ok=True)
+        _link_or_copy(output_path, cache_path)
+        _evict_tts_cache()
+    except FileExistsError:
+        pass
+    except OSError as e:
+        log(f"Could not cache TTS audio: {e}")
+
+def _evict_tts_cache():
+    # Drop least recently used entries (mtime is refreshed on every hit) beyond TTS_CACHE_MAX_MB.
+    limit = TTS_CACHE_MAX_MB * 1024 * 1024
+    with _tts_cache_lock:
+        entries = []
+        total = 0
+        with os.scandir(TTS_CACHE_DIR) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.endswith(".wav"):
+                    st = entry.stat()
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+                    total += st.st_size
+        if total <= limit:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            if total <= limit:
+                break
+
+# Read sizes for the audio download: 64 KiB into the preallocated buffer, 256 KiB when the size is unknown
+DOWNLOAD_CHUNK_SIZE = 1 << 16
+COPY_BLOCK_SIZE = 1 << 18
+
+
+def _speech_payload(text, voice):
+    return {
+        "input": text,
+        "model": "orpheus-tts",
+        "voice": voice.lower(),
+        "response_format": "wav",
+        "speed": 1
+    }
+
 
 def generate_speech(text, voice="tara", progress_callback=None):
     """
@@ -25,35 +169,65 @@ def generate_speech(text, voice="tara", progress_callback=None):
     Returns the path to the generated WAV file, or None on error.
     """
     url = TTS_ENDPOINT
-    headers = {"Content-Type": "application/json"}
-    payload = {
-        "input": text,
-        "model": "orpheus-tts",
-        "voice": voice.lower(),
-        "response_format": "wav",
-        "speed": 1
-    }
+    payload = _speech_payload(text, voice)
     try:
-        outputs_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "outputs"))
-        os.makedirs(outputs_dir, exist_ok=True)
-        filename = f"tts_{uuid.uuid4().hex}.wav"
-        output_path = os.path.join(outputs_dir, filename)
+        output_path = _new_output_path()
 
-        log(f"Requesting audio from Orpheus for voice '{voice}'...")
-        with requests.post(url, headers=headers, data=json.dumps(payload), stream=True, timeout=500) as response:
-            response.raise_for_status()
-            total_length = int(response.headers.get('content-length', 0))
-            bytes_written = 0
+        cache_path = _tts_cache_path(payload)
+        if _reuse_cached_speech(cache_path, output_path):
+            if progress_callback:
+                progress_callback(100)
+            log("Reused cached audio for voice '%s': %s", voice, output_path, level=logging.DEBUG)
+            return output_path
+
+        log("Requesting audio from Orpheus for voice '%s'...", voice, level=logging.DEBUG)
+        with _audio_response(url, payload) as (total_length, iter_chunks):
             with open(output_path, "wb") as out_file:
-                for chunk in response.iter_content(chunk_size=8192):
-                    out_file.write(chunk)
-                    bytes_written += len(chunk)
-                    if progress_callback and total_length > 0:
-                        percent = int(100 * bytes_written / total_length)
-                        progress_callback(min(percent, 99))
+                if total_length > 0:
+                    # Reserve the disk space up front so the file is not extended write by write (POSIX only)
+                    preallocated = False
+                    if hasattr(os, "posix_fallocate"):
+                        try:
+                            os.posix_fallocate(out_file.fileno(), 0, total_length)
+                            preallocated = True
+                        except OSError:
+                            pass
+                    # Known size: fill one preallocated buffer and write it with a single call
+                    buf = bytearray(total_length)
+                    mv = memoryview(buf)
+                    off = 0
+                    last_percent = -1
+                    chunks = iter_chunks(DOWNLOAD_CHUNK_SIZE)
+                    for chunk in chunks:
+                        n = len(chunk)
+                        if off + n > total_length:
+                            # Body is larger than announced (e.g. decoded content): flush and stream the rest
+                            out_file.write(mv[:off])
+                            out_file.write(chunk)
+                            for chunk in chunks:
+                                out_file.write(chunk)
+                            off = 0
+                            break
+                        mv[off:off + n] = chunk
+                        off += n
+                        if progress_callback:
+                            percent = min(int(100 * off / total_length), 99)
+                            if percent != last_percent:
+                                progress_callback(percent)
+                                last_percent = percent
+                    out_file.write(mv[:off])
+                    mv.release()
+                    if preallocated:
+                        # Drop any reserved space a short body did not fill
+                        out_file.truncate()
+                else:
+                    # Nothing to report per chunk: copy the body in large blocks
+                    for chunk in iter_chunks(COPY_BLOCK_SIZE):
+                        out_file.write(chunk)
             if progress_callback:
                 progress_callback(100)
-        log(f"Audio generated and saved to: {output_path}")
+        log("Audio generated and saved to: %s", output_path, level=logging.DEBUG)
+        _store_cached_speech(output_path, cache_path)
         return output_path
     except Exception as e:
         log(f"Error generating speech for voice '{voice}': {e}")
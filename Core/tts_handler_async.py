@@ -0,0 +1,88 @@
+
+# ============================================================================
+# tts_handler_async.py - asyncio/aiohttp batch TTS for LegalTTSV2 (Gradio Edition)
+#
+# Provides run_batch(), which synthesizes many (text, voice) items concurrently on a single thread
+# using aiohttp. Output files, the WAV cache and the request payload are shared with tts_handler,
+# whose synchronous API is unchanged. Requires the optional aiohttp package.
+# ============================================================================
+
+import asyncio
+import os
+import aiohttp
+from Core.llm_handler import log
+from Core.tts_handler import (
+    TTS_ENDPOINT,
+    _JSON_HEADERS,
+    _dumps,
+    _speech_payload,
+    _tts_cache_path,
+    _reuse_cached_speech,
+    _store_cached_speech,
+    _new_output_path,
+)
+
+# Requests in flight at once; the Orpheus server queues anything beyond its own limit
+TTS_ASYNC_CONCURRENCY = int(os.getenv("TTS_ASYNC_CONCURRENCY", "8"))
+
+
+def _write_speech(out_path, body, cache_path):
+    with open(out_path, "wb") as out_file:
+        out_file.write(body)
+    _store_cached_speech(out_path, cache_path)
+
+
+async def generate_speech_async(session, text, voice, out_path):
+    """
+    Generate speech for one chunk with an open aiohttp.ClientSession and save it to out_path.
+    Returns out_path, or None on error.
+    Disk work (cache lookup, the file write, cache store/eviction) runs in worker threads so the
+    event loop keeps serving the other requests.
+    """
+    payload = _speech_payload(text, voice)
+    cache_path = _tts_cache_path(payload)
+    try:
+        if await asyncio.to_thread(_reuse_cached_speech, cache_path, out_path):
+            return out_path
+        async with session.post(TTS_ENDPOINT, data=_dumps(payload), headers=_JSON_HEADERS) as resp:
+            resp.raise_for_status()
+            body = await resp.read()
+        await asyncio.to_thread(_write_speech, out_path, body, cache_path)
+        return out_path
+    except Exception as e:
+        log(f"Error generating speech for voice '{voice}': {e}")
+        return None
+
+
+async def _gather(items, max_concurrency, progress_callback=None):
+    # The semaphore is created inside the running loop it belongs to
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    total = len(items)
+    done = 0
+    timeout = aiohttp.ClientTimeout(total=500)
+    connector = aiohttp.TCPConnector(limit=max(1, max_concurrency))
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        async def _one(text, voice):
+            nonlocal done
+            async with semaphore:
+                path = await generate_speech_async(session, text, voice, _new_output_path())
+            if progress_callback:
+                # All tasks run on this loop's thread, so the counter needs no lock
+                done += 1
+                progress_callback(int(100 * done / total))
+            return path
+        return await asyncio.gather(*(_one(text, voice) for text, voice in items))
+
+
+def run_batch(items, max_concurrency=TTS_ASYNC_CONCURRENCY, progress_callback=None):
+    """
+    Synthesize several (text, voice) items concurrently on one event loop.
+    Returns the output paths in input order (None where synthesis failed).
+    progress_callback, if given, receives the overall percentage of finished items (0-100).
+    Must not be called from a thread that is already running an event loop.
+    """
+    items = list(items)
+    if not items:
+        return []
+    log(f"Requesting audio from Orpheus for {len(items)} chunks (async, {max_concurrency} concurrent)...")
+    return asyncio.run(_gather(items, max_concurrency, progress_callback))
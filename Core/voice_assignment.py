@@ -3,100 +3,124 @@
 # Uses split_long_paragraphs to ensure all chunks are within the TTS length limit. All logic is GUI-agnostic.
 
 import re
+import functools
+import logging
 from Core.doc_utils import split_long_paragraphs
-from Core.llm_handler import log
+from Core.llm_handler import log, log_enabled
+
+# Speaker/summary tags in LLM output, e.g. <SPEAKER 1>, <speaker_2>, <AI Summary>
+# The speaker number is captured so tags are told apart without normalizing the tag text;
+# <AI Summary> has no number and maps to the key None.
+_TAG_PATTERN = re.compile(r'<(?:AI Summary|SPEAKER[ _](\d+))>', re.IGNORECASE)
+
+# Opening and closing speaker/summary tags still present in chunk text before TTS
+_CHUNK_TAG_PATTERN = re.compile(r'<(/?AI SUMMARY|/?SPEAKER ?\d+)>', re.IGNORECASE)
+
+_FEMALE_NAMES = frozenset({"Tara", "Leah", "Jess", "Mia", "Zoe"})
+_MALE_NAMES = frozenset({"Leo", "Dan", "Zac"})
 
 def assign_voices_to_chunks(text, user_voice, all_voices, max_length=750):
     # Parse tags, split long paragraphs, and assign voices to chunks for TTS processing.
     # Returns a list of (chunk, assigned_voice) tuples for downstream audio generation.
-    tag_pattern = re.compile(r'(<(?:AI Summary|SPEAKER[ _]\d+)>)', re.IGNORECASE)
-    parts = tag_pattern.split(text)
-    chunks = []
-    i = 0
-    while i < len(parts):
-        # A non-tag part is always at an even index
-        if parts[i].strip():
-            # Check if there is a corresponding tag part
-            if i + 1 < len(parts):
-                # Combine the tag with the text that follows it
-                chunks.append(parts[i+1] + parts[i])
-                i += 2
-            else:
-                chunks.append(parts[i])
-                i += 1
-        else:
-            i += 1
+    assigned = list(_iter_voice_chunks(text, user_voice, all_voices, max_length))
+    log(f"Total assigned chunks: {len(assigned)}")
+    return assigned
 
-    # If the text starts with a tag, the first part will be empty. The logic needs to handle this.
-    # Let's refine the chunking logic to be more robust.
-    chunks = []
-    # Find all tags and their positions
-    tags_with_indices = [(m.group(0), m.start()) for m in tag_pattern.finditer(text)]
-    last_idx = 0
-    for tag, start_idx in tags_with_indices:
-        # Add the text before the tag
-        if start_idx > last_idx:
-            chunks.append(text[last_idx:start_idx])
-        # The "chunk" is the tag itself, which we'll use for voice assignment later
-        chunks.append(tag)
-        last_idx = start_idx + len(tag)
-    # Add any remaining text after the last tag
-    if last_idx < len(text):
-        chunks.append(text[last_idx:])
-
-    # Now, let's process these chunks to assign voices
-    assigned = []
+def settled_tts_chunks(partial_text, user_voice, all_voices, max_length=750):
+    # For LLM output that is still streaming: the flattened, coalesced (text, voice) TTS chunks that the
+    # complete output is certain to start with. Text before the last complete tag can no longer change;
+    # the last chunk built from it is left out because it may still merge with text after that tag.
+    last_tag = None
+    for last_tag in _TAG_PATTERN.finditer(partial_text):
+        pass
+    if last_tag is None:
+        return []
+    assigned = _iter_voice_chunks(partial_text[:last_tag.start()], user_voice, all_voices, max_length, log_assignments=False)
+    return coalesce_adjacent_same_voice(flatten_with_voices(assigned, max_length=max_length), max_length=max_length)[:-1]
+
+def _iter_voice_chunks(text, user_voice, all_voices, max_length, log_assignments=True):
+    # Yield (chunk, assigned_voice) tuples in a single pass over the speaker tags.
     tag_voice_map = {}
-    female_voices = [v for v in all_voices if v in {"Tara", "Leah", "Jess", "Mia", "Zoe"} and v != user_voice]
-    male_voices = [v for v in all_voices if v in {"Leo", "Dan", "Zac"} and v != user_voice]
+    female_voices = [v for v in all_voices if v in _FEMALE_NAMES and v != user_voice]
+    male_voices = [v for v in all_voices if v in _MALE_NAMES and v != user_voice]
     female_idx, male_idx = 0, 0
     next_is_female = True
-    
+
     current_voice = user_voice
 
-    for chunk in chunks:
-        chunk = chunk.strip()
-        if not chunk:
-            continue
+    def emit(segment, voice):
+        # Text between tags is spoken by the voice of the most recent tag (user_voice before any tag)
+        segment = segment.strip()
+        if not segment:
+            return ()
+        if len(segment) <= max_length:
+            return ((segment, voice),)
+        return [(sub_chunk, voice) for sub_chunk in split_long_paragraphs([segment], max_length=max_length) if sub_chunk]
 
-        tag_match = tag_pattern.match(chunk)
-        if tag_match:
-            tag = tag_match.group(0).upper().replace('_', ' ') # Normalize tag
-            if tag in tag_voice_map:
-                current_voice = tag_voice_map[tag]
-            else:
-                if female_voices or male_voices:
-                    if next_is_female and female_voices:
-                        new_voice = female_voices[female_idx % len(female_voices)]
-                        female_idx += 1
-                        next_is_female = False
-                    elif male_voices:
-                        new_voice = male_voices[male_idx % len(male_voices)]
-                        male_idx += 1
-                        next_is_female = True
-                    else:
-                        new_voice = (female_voices + male_voices)[0]
-                    
-                    log(f"Assigned voice '{new_voice}' to tag {tag}")
-                    tag_voice_map[tag] = new_voice
-                    current_voice = new_voice
+    # Single pass over the tags: emit the text before each tag, then switch voice
+    last_idx = 0
+    for m in _TAG_PATTERN.finditer(text):
+        yield from emit(text[last_idx:m.start()], current_voice)
+        last_idx = m.end()
+        tag = m.group(1)
+        if tag in tag_voice_map:
+            current_voice = tag_voice_map[tag]
+        else:
+            if female_voices or male_voices:
+                if next_is_female and female_voices:
+                    new_voice = female_voices[female_idx % len(female_voices)]
+                    female_idx += 1
+                    next_is_female = False
+                elif male_voices:
+                    new_voice = male_voices[male_idx % len(male_voices)]
+                    male_idx += 1
+                    next_is_female = True
                 else:
-                    # No alternate voices available, use user_voice
-                    tag_voice_map[tag] = user_voice
-                    current_voice = user_voice
-            # This chunk is just a tag, so we continue to the next chunk which contains the text
-            continue
-        
-        # This chunk is text, assign the current_voice
-        for sub_chunk in split_long_paragraphs([chunk], max_length=max_length):
-            if sub_chunk:
-                assigned.append((sub_chunk, current_voice))
-
-    # If no tags were found at all, the whole text gets the user_voice
-    if not tags_with_indices:
-        for sub_chunk in split_long_paragraphs([text], max_length=max_length):
-            if sub_chunk:
-                assigned.append((sub_chunk, user_voice))
-                
-    log(f"Total assigned chunks: {len(assigned)}")
-    return assigned
+                    new_voice = (female_voices + male_voices)[0]
+
+                if log_assignments and log_enabled(logging.DEBUG):
+                    log("Assigned voice '%s' to tag %s", new_voice, f"<SPEAKER {tag}>" if tag else "<AI SUMMARY>", level=logging.DEBUG)
+                tag_voice_map[tag] = new_voice
+                current_voice = new_voice
+            else:
+                # No alternate voices available, use user_voice
+                tag_voice_map[tag] = user_voice
+                current_voice = user_voice
+    # Any remaining text after the last tag (or the whole text if there were no tags)
+    yield from emit(text[last_idx:], current_voice)
+
+
+def coalesce_adjacent_same_voice(assigned, max_length=750):
+    # Merge consecutive (chunk, voice) tuples that share a voice while the merged text stays within max_length,
+    # so the TTS server gets fewer, fuller requests. Chunks are joined with a paragraph break.
+    merged = []
+    for chunk, voice in assigned:
+        if merged and merged[-1][1] == voice and len(merged[-1][0]) + 2 + len(chunk) <= max_length:
+            merged[-1] = (merged[-1][0] + "\n\n" + chunk, voice)
+        else:
+            merged.append((chunk, voice))
+    return merged
+
+
+def flatten_with_voices(chunks_and_voices, max_length=750):
+    # Strip leftover tags from (chunk, voice) pairs and split any chunk over max_length.
+    # Returns a list of (text, voice) tuples ready for TTS; chunks left empty are dropped.
+    return list(_flatten_with_voices(tuple((chunk, voice) for chunk, voice in chunks_and_voices), max_length))
+
+@functools.lru_cache(maxsize=32)
+def _flatten_with_voices(chunks_and_voices, max_length):
+    # Memoized on the chunk tuple, so re-running the same LLM output skips the cleanup and splitting.
+    flat = []
+    for chunk, voice in chunks_and_voices:
+        flat.extend(_clean_chunk(chunk, voice, max_length))
+    return tuple(flat)
+
+def _clean_chunk(chunk, voice, max_length):
+    # Strip leftover tags from one chunk and split it to max_length; returns (text, voice) tuples.
+    # Chunks from assign_voices_to_chunks are already stripped; only ones with tags need the regex
+    clean_chunk = _CHUNK_TAG_PATTERN.sub('', chunk).strip() if '<' in chunk else chunk.strip()
+    if not clean_chunk:
+        return ()
+    if len(clean_chunk) <= max_length:
+        return ((clean_chunk, voice),)
+    return [(sub_chunk, voice) for sub_chunk in split_long_paragraphs([clean_chunk], max_length=max_length) if sub_chunk]
@@ -8,58 +8,184 @@
 
 
 import os
-import re
-from pydub import AudioSegment
+import time
+import wave
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
 from dotenv import load_dotenv
 from Core.llm_handler import get_llm_response
-from Core.tts_handler import generate_speech
-from Core.doc_utils import extract_text_from_docx, convert_to_docx, split_long_paragraphs, ensure_ollama_text
+from Core.tts_handler import generate_speech, TTS_MAX_WORKERS
+from Core.doc_utils import extract_text_from_docx, convert_to_docx, ensure_ollama_text, word_session
 from Core.constants import MAX_CHUNK_LENGTH
 from Core.prompt_handler import get_system_prompt
-from Core.voice_assignment import assign_voices_to_chunks
-from Core.audio_deduplication import auto_cleaned_filename, clean_audio_with_stt
-from Core.audio_utils import concatenate_and_cleanup_audio
-from Core.gemini_handler import process_gemini_request
+from Core.voice_assignment import assign_voices_to_chunks, coalesce_adjacent_same_voice, flatten_with_voices, settled_tts_chunks
+# UI option lists live in app_meta so the Gradio UI can build without importing this module
+from Gui.app_meta import VOICE_OPTIONS, MODEL_OPTIONS, PROMPT_OPTIONS
+# gemini_handler (google-generativeai), audio_utils (pydub) and audio_deduplication (faster-whisper)
+# are imported in the branches that use them, so Ollama-only or skip-TTS runs never load them.
 from dotenv import load_dotenv
 
 load_dotenv()
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-# Gradio UI options/constants
-VOICE_OPTIONS = [
-    ("Tara", "Female, English, conversational, clear"),
-    ("Leah", "Female, English, warm, gentle"),
-    ("Jess", "Female, English, energetic, youthful"),
-    ("Leo", "Male, English, authoritative, deep"),
-    ("Dan", "Male, English, friendly, casual"),
-    ("Mia", "Female, English, professional, articulate"),
-    ("Zac", "Male, English, enthusiastic, dynamic"),
-    ("Zoe", "Female, English, calm, soothing")
-]
-
-MODEL_OPTIONS = [
-    ("No Model", "no_model"),
-    ("sushruth/solar-uncensored", "sushruth/solar-uncensored"),
-    ("gemma3:1b", "gemma3:1b"),
-    ("mistral:7b", "mistral:7b"),
-    ("llama3:8b", "llama3:8b"),
-    ("Gemini 2.5 Pro (API)", "gemini-2.5-pro"),
-    ("Gemini 2.5 Flash (API)", "gemini-2.5-flash")
-]
+# Seconds between status lines while a document is being converted/extracted
+PARSE_STATUS_INTERVAL = 1.0
+# Set LTTS_TTS_ASYNC=1 (requires aiohttp) to run TTS requests on one asyncio event loop instead of a thread pool
+TTS_ASYNC = os.getenv("LTTS_TTS_ASYNC", "0") == "1"
+class _ThrottledProgress:
+    # Forwards progress values at most every `interval` seconds; 100 (and any value after a pause)
+    # always gets through, so the bar still finishes. Per-token/per-chunk callbacks otherwise trigger
+    # a UI update and a log line each time.
+    def __init__(self, callback, interval=0.1):
+        self.callback = callback
+        self.interval = interval
+        self.last = 0.0
 
+    def __call__(self, val):
+        now = time.monotonic()
+        if val >= 100 or now - self.last >= self.interval:
+            self.last = now
+            self.callback(val)
+
+def _stream_llm_response(llm_response_gen, text_output_path, on_text=None):
+    # Collect the streamed LLM text (skipping "LLM Logs:" status lines) and join it once. Each piece is
+    # also written to the LLM log as it arrives, so a run that fails mid-generation keeps the partial output,
+    # and passed to on_text (if given) so later stages can start before the response is complete.
+    parts = []
+    try:
+        log_file = open(text_output_path, "w", encoding="utf-8")
+    except OSError:
+        log_file = None
+    try:
+        for chunk in llm_response_gen:
+            if isinstance(chunk, str) and not chunk.startswith("LLM Logs:"):
+                parts.append(chunk)
+                if log_file:
+                    log_file.write(chunk)
+                if on_text:
+                    on_text(chunk)
+    finally:
+        if log_file:
+            log_file.close()
+    llm_response = "".join(parts)
+    if log_file and not llm_response:
+        os.remove(text_output_path)
+    return llm_response
+
+class _SpeechPrefetcher:
+    # Overlaps TTS with LLM generation. Fed the streamed LLM text, it starts synthesizing each chunk that
+    # settled_tts_chunks reports as final while the model is still writing the rest; speech_batch() then
+    # reuses those requests for the TTS stage instead of sending them again.
+    def __init__(self, user_voice, all_voices, max_length, max_workers=TTS_MAX_WORKERS):
+        self.user_voice = user_voice
+        self.all_voices = all_voices
+        self.max_length = max_length
+        self.max_workers = max_workers
+        self.futures = {}  # (text, voice) -> Future of the output path
+        self._parts = []
+        self._executor = None
+
+    def _submit(self, item):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=max(1, self.max_workers), thread_name_prefix="tts")
+        future = self.futures[item] = self._executor.submit(generate_speech, *item)
+        return future
+
+    def feed(self, text):
+        self._parts.append(text)
+        # Only a newly completed tag can settle more chunks
+        if ">" not in text:
+            return
+        settled = settled_tts_chunks("".join(self._parts), self.user_voice, self.all_voices, max_length=self.max_length)
+        for item in settled:
+            if item not in self.futures:
+                self._submit(item)
+
+    def speech_batch(self, items, progress_callback=None):
+        # Yields (index, output_path) in completion order; output_path is None for failed items.
+        items = list(items)
+        futures = {}
+        for index, item in enumerate(items):
+            future = self.futures.get(item) or self._submit(item)
+            futures[future] = index
+        done = 0
+        try:
+            for future in as_completed(futures):
+                done += 1
+                if progress_callback:
+                    progress_callback(int(100 * done / len(futures)))
+                yield futures[future], future.result()
+        finally:
+            self.close(keep=items)
+
+    def close(self, keep=()):
+        # Stop queued requests and delete audio made for chunks the final response did not contain
+        if self._executor is None:
+            return
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+        keep = set(keep)
+        for item, future in self.futures.items():
+            if item not in keep:
+                # Requests still running delete their output when they finish
+                future.add_done_callback(_discard_speech_output)
+
+def _discard_speech_output(future):
+    if future.cancelled() or future.exception():
+        return
+    path = future.result()
+    if path:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def _extract_document_text(input_file_path):
+    # Runs on the single-use parse thread: any Word instance a PDF/RTF conversion starts there is
+    # quit (and COM released) on that thread before it exits
+    with word_session():
+        return ensure_ollama_text(input_file_path)
+
+def _read_wav_pcm(path, pause_ms=0):
+    # Read a 16-bit PCM WAV chunk as (sample_rate, int16 ndarray) for the streaming audio player,
+    # optionally preceded by pause_ms of silence to match the pauses in the combined file.
+    import numpy as np
+    with wave.open(path, 'rb') as w:
+        sample_rate = w.getframerate()
+        channels = w.getnchannels()
+        samples = np.frombuffer(w.readframes(w.getnframes()), dtype=np.int16)
+    if channels > 1:
+        samples = samples.reshape(-1, channels)
+    if pause_ms:
+        silence = np.zeros((sample_rate * pause_ms // 1000,) + samples.shape[1:], dtype=np.int16)
+        samples = np.concatenate([silence, samples])
+    return sample_rate, samples
+
+# Whisper model for audio deduplication. The first run that produces audio starts loading it in the
+# background (while the LLM and TTS stages run), so deduplication does not wait for the weights;
+# LLM-only runs never load faster-whisper.
+WHISPER_MODEL = "tiny.en"
+_whisper_preload_lock = threading.Lock()
+_whisper_preload_started = False
+
+def _preload_whisper():
+    # The import happens on this thread too, so faster-whisper stays off the request path
+    try:
+        from Core.audio_deduplication import preload_whisper_model
+    except ImportError:
+        return
+    preload_whisper_model(WHISPER_MODEL)
+
+def _start_whisper_preload():
+    global _whisper_preload_started
+    with _whisper_preload_lock:
+        if _whisper_preload_started:
+            return
+        _whisper_preload_started = True
+    threading.Thread(target=_preload_whisper, name="whisper-import", daemon=True).start()
 
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-prompts_dir = os.path.join(project_root, "Prompts")
-PROMPT_OPTIONS = {}
-if os.path.isdir(prompts_dir):
-    for fname in os.listdir(prompts_dir):
-        if fname.lower().endswith(".txt"):
-            prompt_name = os.path.splitext(fname)[0]
-            prompt_path = os.path.join(prompts_dir, fname)
-            try:
-                with open(prompt_path, "r", encoding="utf-8") as f:
-                    PROMPT_OPTIONS[prompt_name] = f.read()
-            except Exception as e:
-                PROMPT_OPTIONS[prompt_name] = f"[Error loading prompt: {e}]"
+LOGS_DIR = os.path.join(project_root, "logs")
+OUTPUTS_DIR = os.path.join(project_root, "outputs")
 
 def process_document_backend(
     input_file_path,
@@ -72,279 +198,338 @@ def process_document_backend(
     skip_tts=False,
     progress=None,
     llm_progress_cb=None,
-    tts_progress_cb=None
+    tts_progress_cb=None,
+    tts_chunk_cb=None,
+    hedge_model=None,
+    raw_text=None
 ):
 
 
     # Convert input file to DOCX if needed (handles RTF, PDF, DOCX)
     temp_audio_files = []
     llm_response = None
+    llm_log_path = None  # set when the Ollama response was already streamed to its LLM log
     system_prompt, prompt_status = get_system_prompt(system_prompt_key, prompt_options, prompt_text)
     yield prompt_status
     if not system_prompt:
         return
 
-    # --- Custom LLM Input Bypass for ALL Models ---
-    is_custom_text = hasattr(input_file_path, 'read') and hasattr(input_file_path, 'text')
-    custom_text = input_file_path.text if is_custom_text else None
-
-    if is_custom_text:
-        # Custom text input: skip all file conversion and extraction logic
-        yield "Processing custom text input..."
-        if model_name in ["gemini-2.5-pro", "gemini-2.5-flash"]:
-            # Use the unified Gemini request handler for text
-            gemini_gen = process_gemini_request(
-                input_path=None,
-                input_text=custom_text,
-                model_name=model_name,
-                system_prompt=system_prompt,
-                voice_name=voice_name,
-                all_voices=[v[0] for v in voice_options],
-                max_length=MAX_CHUNK_LENGTH
-            )
-            for result in gemini_gen:
-                if isinstance(result, str):
-                    yield f"[Gemini Debug] {result}"
-                elif isinstance(result, tuple) and len(result) == 2:
-                    chunks_and_voices, llm_response = result
-        else:
-            # For Ollama or other models, use get_llm_response generator
-            yield "Sending custom text to Ollama..."
-            combined_input = f"{system_prompt}\n\n{custom_text}" if system_prompt else custom_text
-            llm_response_gen = get_llm_response(model_name, system_prompt, custom_text)
-            llm_response = ""
-            for chunk in llm_response_gen:
-                if isinstance(chunk, str) and not chunk.startswith("LLM Logs:"):
-                    llm_response += chunk
-            if not llm_response:
-                yield "LLM processing failed."
-                return
-            yield f"[LLM Response]\n{llm_response.strip()}"
-            all_voices = [v[0] for v in voice_options]
-            chunks_and_voices = assign_voices_to_chunks(llm_response, voice_name, all_voices, max_length=MAX_CHUNK_LENGTH)
+    if not skip_tts:
+        _start_whisper_preload()
 
-        if llm_progress_cb:
-            llm_progress_cb(100)
-        elif progress:
-            progress(100, desc="LLM: Complete.")
-        yield f"LLM processing complete. {len(chunks_and_voices)} chunks ready for TTS."
+    # Ollama responses stream, so TTS starts on settled chunks while the LLM is still generating
+    prefetcher = None
+    if not skip_tts and not TTS_ASYNC:
+        prefetcher = _SpeechPrefetcher(voice_name, [v[0] for v in voice_options], MAX_CHUNK_LENGTH)
+    prefetch_text = prefetcher.feed if prefetcher else None
+
+    try:
+        # --- Custom LLM Input Bypass for ALL Models ---
+        # raw_text (the Custom LLM Input box) is used instead of input_file_path and skips parsing
+        is_custom_text = raw_text is not None
+        custom_text = raw_text
 
-        # Save LLM response from custom text to a log file
         if is_custom_text:
+            # Custom text input: skip all file conversion and extraction logic
+            yield "Processing custom text input..."
             timestamp = time.strftime("%Y%m%d_%H%M%S")
             orig_base = f"custom_input_{timestamp}"
-            logs_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "logs"))
+            logs_dir = LOGS_DIR
             os.makedirs(logs_dir, exist_ok=True)
             text_output_path = os.path.join(logs_dir, f"{orig_base}_LLMLOG.txt")
-            if llm_response:
-                try:
-                    with open(text_output_path, "w", encoding="utf-8") as f:
-                        f.write(llm_response)
-                    yield f"LLM response for custom text saved to: {text_output_path}"
-                except Exception as e:
-                    yield f"Failed to save LLM response for custom text: {e}"
-
-    else:
-        # Unified file handling for Gemini and Ollama
-        all_voices = [v[0] for v in voice_options]
-        chunks_and_voices = []
-        llm_response = None
-        ext = os.path.splitext(input_file_path)[1].strip().lower()
-        file_size = os.path.getsize(input_file_path)
-        if model_name in ["gemini-2.5-pro", "gemini-2.5-flash"]:
-            # Enforce Gemini file type and size limits
-            if ext not in [".pdf", ".txt", ".docx", ".rtf"]:
-                yield f"Gemini only accepts PDF, TXT, DOCX, or RTF. File type: {ext}"
-                return
-            yield f"Sending document to Gemini API as: {os.path.basename(input_file_path)}..."
+            llm_log_streamed = False
+            if model_name in ["gemini-2.5-pro", "gemini-2.5-flash"]:
+                from Core.gemini_handler import process_gemini_request
+                # Use the unified Gemini request handler for text
+                gemini_gen = process_gemini_request(
+                    input_path=None,
+                    input_text=custom_text,
+                    model_name=model_name,
+                    system_prompt=system_prompt,
+                    voice_name=voice_name,
+                    all_voices=[v[0] for v in voice_options],
+                    max_length=MAX_CHUNK_LENGTH
+                )
+                for result in gemini_gen:
+                    if isinstance(result, str):
+                        yield f"[Gemini Debug] {result}"
+                    elif isinstance(result, tuple) and len(result) == 2:
+                        chunks_and_voices, llm_response = result
+            else:
+                # For Ollama or other models, use get_llm_response generator
+                yield "Sending custom text to Ollama..."
+                combined_input = f"{system_prompt}\n\n{custom_text}" if system_prompt else custom_text
+                llm_response_gen = get_llm_response(model_name, system_prompt, custom_text, hedge_model=hedge_model)
+                llm_response = _stream_llm_response(llm_response_gen, text_output_path, on_text=prefetch_text)
+                llm_log_streamed = True
+                if not llm_response:
+                    yield "LLM processing failed."
+                    return
+                yield f"[LLM Response]\n{llm_response.strip()}"
+                all_voices = [v[0] for v in voice_options]
+                chunks_and_voices = assign_voices_to_chunks(llm_response, voice_name, all_voices, max_length=MAX_CHUNK_LENGTH)
+
             if llm_progress_cb:
-                llm_progress_cb(10)
+                llm_progress_cb(100)
             elif progress:
-                progress(10, desc="LLM: Sending to Gemini API...")
-            # Collect Gemini logs and results
-            chunks_and_voices = None
+                progress(100, desc="LLM: Complete.")
+            yield f"LLM processing complete. {len(chunks_and_voices)} chunks ready for TTS."
+
+            # Save LLM response from custom text to a log file (Ollama responses were written while streaming)
+            if is_custom_text:
+                if llm_response:
+                    try:
+                        if not llm_log_streamed:
+                            with open(text_output_path, "w", encoding="utf-8") as f:
+                                f.write(llm_response)
+                        yield f"LLM response for custom text saved to: {text_output_path}"
+                    except Exception as e:
+                        yield f"Failed to save LLM response for custom text: {e}"
+
+        else:
+            # Unified file handling for Gemini and Ollama
+            all_voices = [v[0] for v in voice_options]
+            chunks_and_voices = []
             llm_response = None
-            orig_base = os.path.splitext(os.path.basename(input_file_path))[0]
-            logs_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "logs"))
-            os.makedirs(logs_dir, exist_ok=True)
-            text_output_path = os.path.join(logs_dir, f"{orig_base}_LLMLOG.txt")
-            gemini_logs = []
-            for result in process_gemini_request(
-                input_file_path,
-                None,
-                model_name,
-                system_prompt,
-                voice_name,
-                all_voices,
-                max_length=MAX_CHUNK_LENGTH
-            ):
-                if isinstance(result, str):
-                    gemini_logs.append(result)
-                    yield f"[Gemini Debug] {result}"
-                elif isinstance(result, tuple) and len(result) == 2:
-                    chunks_and_voices, llm_response = result
-            # If Gemini failed, still create a log file with error info
-            if not chunks_and_voices or not llm_response:
+            ext = os.path.splitext(input_file_path)[1].strip().lower()
+            file_size = os.path.getsize(input_file_path)
+            if model_name in ["gemini-2.5-pro", "gemini-2.5-flash"]:
+                # Enforce Gemini file type and size limits
+                if ext not in [".pdf", ".txt", ".docx", ".rtf"]:
+                    yield f"Gemini only accepts PDF, TXT, DOCX, or RTF. File type: {ext}"
+                    return
+                yield f"Sending document to Gemini API as: {os.path.basename(input_file_path)}..."
+                if llm_progress_cb:
+                    llm_progress_cb(10)
+                elif progress:
+                    progress(10, desc="LLM: Sending to Gemini API...")
+                # Collect Gemini logs and results
+                chunks_and_voices = None
+                llm_response = None
+                orig_base = os.path.splitext(os.path.basename(input_file_path))[0]
+                logs_dir = LOGS_DIR
+                os.makedirs(logs_dir, exist_ok=True)
+                text_output_path = os.path.join(logs_dir, f"{orig_base}_LLMLOG.txt")
+                gemini_logs = []
+                from Core.gemini_handler import process_gemini_request
+                for result in process_gemini_request(
+                    input_file_path,
+                    None,
+                    model_name,
+                    system_prompt,
+                    voice_name,
+                    all_voices,
+                    max_length=MAX_CHUNK_LENGTH
+                ):
+                    if isinstance(result, str):
+                        gemini_logs.append(result)
+                        yield f"[Gemini Debug] {result}"
+                    elif isinstance(result, tuple) and len(result) == 2:
+                        chunks_and_voices, llm_response = result
+                # If Gemini failed, still create a log file with error info
+                if not chunks_and_voices or not llm_response:
+                    try:
+                        with open(text_output_path, "w", encoding="utf-8") as f:
+                            f.write("[Gemini workflow failed: No response returned]")
+                        yield f"Gemini workflow failed: No response returned."
+                        yield f"[Gemini Log File] {text_output_path}"
+                    except Exception as e:
+                        yield f"Failed to log Gemini API response: {e}"
+                    return
                 try:
                     with open(text_output_path, "w", encoding="utf-8") as f:
-                        f.write("[Gemini workflow failed: No response returned]")
-                    yield f"Gemini workflow failed: No response returned."
+                        f.write(llm_response if llm_response else "[No Gemini API response received]")
+                    llm_log_path = text_output_path
+                    yield f"Gemini API response logged to: {text_output_path}"
                     yield f"[Gemini Log File] {text_output_path}"
                 except Exception as e:
                     yield f"Failed to log Gemini API response: {e}"
-                return
-            try:
-                with open(text_output_path, "w", encoding="utf-8") as f:
-                    f.write(llm_response if llm_response else "[No Gemini API response received]")
-                yield f"Gemini API response logged to: {text_output_path}"
-                yield f"[Gemini Log File] {text_output_path}"
-            except Exception as e:
-                yield f"Failed to log Gemini API response: {e}"
-            if llm_response and llm_response.strip():
-                yield f"[Gemini LLM Response]\n{llm_response.strip()}"
-            if llm_progress_cb:
-                llm_progress_cb(100)
-            elif progress:
-                progress(100, desc="LLM: Gemini response received.")
-            if not chunks_and_voices:
                 if llm_response and llm_response.strip():
-                    yield "Gemini LLM response could not be chunked for TTS. Check prompt or input formatting."
-                else:
-                    yield "Gemini processing failed or returned no response."
-                return
-            if not isinstance(chunks_and_voices, list) or not all(isinstance(x, (tuple, list)) and len(x) == 2 for x in chunks_and_voices):
-                yield f"Gemini returned malformed chunk list: {chunks_and_voices}"
-                return
-            yield f"Gemini LLM processing complete. {len(chunks_and_voices)} chunks ready for TTS."
-        else:
-            # Ollama: process TXT directly, convert/extract for others
-            try:
-                doc_text = ensure_ollama_text(input_file_path)
-            except ValueError as ve:
-                yield (f"Invalid file type. Only PDF, DOCX, RTF, and TXT files are allowed.\nDetails: {ve}")
-                return
-            except Exception as e:
-                yield f"File conversion failed: {e}"
-                return
-            yield "Extracted and cleaned text. Running LLM..."
-            def _llm_progress(val):
+                    yield f"[Gemini LLM Response]\n{llm_response.strip()}"
                 if llm_progress_cb:
-                    llm_progress_cb(val)
+                    llm_progress_cb(100)
                 elif progress:
-                    progress(val, desc=f"LLM: Processing ({val}%)")
-            llm_response_gen = get_llm_response(model_name, system_prompt, doc_text, progress_callback=_llm_progress)
-            llm_response = ""
-            for chunk in llm_response_gen:
-                if isinstance(chunk, str) and not chunk.startswith("LLM Logs:"):
-                    llm_response += chunk
-            if not llm_response:
-                yield "LLM processing failed."
-                return
-            yield "LLM response received. Assigning voices to chunks..."
-            chunks_and_voices = assign_voices_to_chunks(llm_response, voice_name, all_voices, max_length=MAX_CHUNK_LENGTH)
-            if llm_progress_cb:
-                llm_progress_cb(100)
-            elif progress:
-                progress(100, desc="LLM: Complete.")
-            yield "Voice assignment complete."
+                    progress(100, desc="LLM: Gemini response received.")
+                if not chunks_and_voices:
+                    if llm_response and llm_response.strip():
+                        yield "Gemini LLM response could not be chunked for TTS. Check prompt or input formatting."
+                    else:
+                        yield "Gemini processing failed or returned no response."
+                    return
+                if not isinstance(chunks_and_voices, list) or not all(isinstance(x, (tuple, list)) and len(x) == 2 for x in chunks_and_voices):
+                    yield f"Gemini returned malformed chunk list: {chunks_and_voices}"
+                    return
+                yield f"Gemini LLM processing complete. {len(chunks_and_voices)} chunks ready for TTS."
+            else:
+                # Ollama: process TXT directly, convert/extract for others
+                # Conversion runs on a worker thread so status keeps reaching the UI while a large
+                # PDF/DOCX/RTF is being parsed
+                yield "Extracting text from document..."
+                try:
+                    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="doc-parse") as parse_pool:
+                        parse_future = parse_pool.submit(_extract_document_text, input_file_path)
+                        parse_started = time.monotonic()
+                        while not wait([parse_future], timeout=PARSE_STATUS_INTERVAL).done:
+                            yield f"Extracting text from document... ({time.monotonic() - parse_started:.0f}s)"
+                        doc_text = parse_future.result()
+                except ValueError as ve:
+                    yield (f"Invalid file type. Only PDF, DOCX, RTF, and TXT files are allowed.\nDetails: {ve}")
+                    return
+                except Exception as e:
+                    yield f"File conversion failed: {e}"
+                    return
+                yield "Extracted and cleaned text. Running LLM..."
+                def _llm_progress(val):
+                    if llm_progress_cb:
+                        llm_progress_cb(val)
+                    elif progress:
+                        progress(val, desc=f"LLM: Processing ({val}%)")
+                llm_response_gen = get_llm_response(model_name, system_prompt, doc_text, progress_callback=_ThrottledProgress(_llm_progress), hedge_model=hedge_model)
+                orig_base = os.path.splitext(os.path.basename(input_file_path))[0]
+                os.makedirs(LOGS_DIR, exist_ok=True)
+                llm_log_path = os.path.join(LOGS_DIR, f"{orig_base}_LLMLOG.txt")
+                llm_response = _stream_llm_response(llm_response_gen, llm_log_path, on_text=prefetch_text)
+                if not llm_response:
+                    yield "LLM processing failed."
+                    return
+                yield "LLM response received. Assigning voices to chunks..."
+                chunks_and_voices = assign_voices_to_chunks(llm_response, voice_name, all_voices, max_length=MAX_CHUNK_LENGTH)
+                if llm_progress_cb:
+                    llm_progress_cb(100)
+                elif progress:
+                    progress(100, desc="LLM: Complete.")
+                yield "Voice assignment complete."
 
-    # --- Prepare TTS chunks and run TTS/audio for all models ---
-    if not chunks_and_voices:
-        yield "No valid chunks for TTS."
-        return
-    tag_pattern = re.compile(r'<(/?AI SUMMARY|/?SPEAKER ?\d+)>', re.IGNORECASE)
-    max_length = MAX_CHUNK_LENGTH
-    flat_chunks = []
-    for idx, (chunk, assigned_voice) in enumerate(chunks_and_voices):
-        clean_chunk = tag_pattern.sub('', chunk).strip()
-        # Split only if needed, otherwise just use the chunk
-        if len(clean_chunk) > max_length:
-            sub_chunks = split_long_paragraphs([clean_chunk], max_length=max_length)
-            for sub_chunk in sub_chunks:
-                flat_chunks.append((sub_chunk, assigned_voice))
-        else:
-            flat_chunks.append((clean_chunk, assigned_voice))
-        # Log chunk number and character count
-        yield f"Chunk {idx+1}: {len(clean_chunk)} characters | Voice: {assigned_voice}"
+        # Save the LLM response once, before (and regardless of) TTS. Custom text was saved in its
+        # branch above; Ollama responses were already streamed into this file.
+        if not is_custom_text:
+            orig_base = os.path.splitext(os.path.basename(input_file_path))[0]
+            os.makedirs(LOGS_DIR, exist_ok=True)
+            text_output_path = os.path.join(LOGS_DIR, f"{orig_base}_LLMLOG.txt")
+            if llm_response:
+                try:
+                    if text_output_path != llm_log_path:
+                        with open(text_output_path, "w", encoding="utf-8") as f:
+                            f.write(llm_response)
+                    yield f"LLM response saved to: {text_output_path}"
+                except Exception as e:
+                    yield f"Failed to save AI response: {e}"
 
-    # TTS processing (moved outside the chunk loop)
-    audio_segments = []
-    tts_fail_count = 0
-    if not skip_tts:
-        import time
-        total_tts = len(flat_chunks)
-        for flat_idx, (sub_chunk, assigned_voice) in enumerate(flat_chunks):
-            def per_chunk_progress(val):
-                base = int(100 * flat_idx / total_tts)
-                next_base = int(100 * (flat_idx + 1) / total_tts)
-                mapped = base + int((next_base - base) * val / 100)
+        # --- Prepare TTS chunks and run TTS/audio for all models ---
+        if not chunks_and_voices:
+            yield "No valid chunks for TTS."
+            return
+        max_length = MAX_CHUNK_LENGTH
+        for idx, (chunk, assigned_voice) in enumerate(chunks_and_voices):
+            # Log chunk number and character count
+            yield f"Chunk {idx+1}: {len(chunk)} characters | Voice: {assigned_voice}"
+        flat_chunks = flatten_with_voices(chunks_and_voices, max_length=max_length)
+        # Fewer, fuller TTS requests: adjacent chunks for the same voice share one request up to max_length
+        flat_chunks = coalesce_adjacent_same_voice(flat_chunks, max_length=max_length)
+
+        # TTS processing (moved outside the chunk loop)
+        tts_fail_count = 0
+        if not skip_tts:
+            total_tts = len(flat_chunks)
+            # Repeated (text, voice) chunks are synthesized once and their WAV listed again;
+            # cleanup skips paths already removed
+            unique_chunks = list(dict.fromkeys(flat_chunks))
+            def batch_progress(val):
                 if tts_progress_cb:
-                    tts_progress_cb(mapped)
+                    tts_progress_cb(val)
                 elif progress:
-                    progress(mapped, desc=f"TTS: {flat_idx+1}/{total_tts} audio chunks done")
-            yield f"Generating speech for chunk {flat_idx+1}/{total_tts} (voice: {assigned_voice})..."
-            audio_path = generate_speech(sub_chunk, assigned_voice, progress_callback=per_chunk_progress)
-            if not audio_path:
-                tts_fail_count += 1
-                yield f"TTS failed for chunk {flat_idx+1}. Skipping."
-                continue
-            temp_audio_files.append(audio_path)
-            seg = AudioSegment.from_wav(audio_path)
-            audio_segments.append(seg)
-            # Wait briefly to ensure TTS server is ready for next chunk
-            time.sleep(0.2)
-        if tts_fail_count == total_tts:
-            yield "All TTS requests failed. No audio was generated. Please check the Orpheus TTS server and logs."
-        else:
-            yield "TTS complete."
-
+                    progress(val, desc=f"TTS: {val}% of audio chunks done")
+            yield f"Generating speech for {len(unique_chunks)} unique chunks of {total_tts} ({TTS_MAX_WORKERS} at a time)..."
+            # Requests run concurrently on a bounded pool; results come back in completion order
+            # and are placed by index, so the audio keeps the chunk order
+            unique_paths = [None] * len(unique_chunks)
+            paths_by_chunk = {}
+            # tts_chunk_cb receives each chunk's audio as (sample_rate, ndarray) in document order, as soon
+            # as it and every earlier chunk are done, so playback starts before the whole file exists
+            next_stream_idx = 0
+            def stream_ready_chunks():
+                nonlocal next_stream_idx
+                while next_stream_idx < total_tts and flat_chunks[next_stream_idx] in paths_by_chunk:
+                    audio_path = paths_by_chunk[flat_chunks[next_stream_idx]]
+                    if audio_path:
+                        try:
+                            tts_chunk_cb(*_read_wav_pcm(audio_path, pause_ms=1000 if next_stream_idx else 0))
+                        except Exception as e:
+                            print(f"Warning: Could not stream audio chunk {next_stream_idx+1}: {e}")
+                    next_stream_idx += 1
+            if TTS_ASYNC:
+                # Single-threaded asyncio/aiohttp fan-out (LTTS_TTS_ASYNC=1); returns once every chunk is done
+                from Core.tts_handler_async import run_batch
+                unique_paths = run_batch(unique_chunks, progress_callback=_ThrottledProgress(batch_progress))
+                for unique_idx, audio_path in enumerate(unique_paths):
+                    paths_by_chunk[unique_chunks[unique_idx]] = audio_path
+                    if not audio_path:
+                        yield f"TTS failed for chunk {unique_idx+1}. Skipping."
+                if tts_chunk_cb:
+                    stream_ready_chunks()
+            else:
+                if prefetcher.futures:
+                    yield f"{len(prefetcher.futures)} chunks were already sent to TTS while the LLM was generating."
+                for unique_idx, audio_path in prefetcher.speech_batch(unique_chunks, progress_callback=_ThrottledProgress(batch_progress)):
+                    unique_paths[unique_idx] = audio_path
+                    paths_by_chunk[unique_chunks[unique_idx]] = audio_path
+                    if tts_chunk_cb:
+                        stream_ready_chunks()
+                    if audio_path:
+                        yield f"Speech ready for chunk {unique_idx+1}/{len(unique_chunks)} (voice: {unique_chunks[unique_idx][1]})."
+                    else:
+                        yield f"TTS failed for chunk {unique_idx+1}. Skipping."
+            for chunk_and_voice in flat_chunks:
+                audio_path = paths_by_chunk[chunk_and_voice]
+                if not audio_path:
+                    tts_fail_count += 1
+                    continue
+                temp_audio_files.append(audio_path)
+            if tts_fail_count == total_tts:
+                yield "All TTS requests failed. No audio was generated. Please check the Orpheus TTS server and logs."
+            else:
+                yield "TTS complete."
 
-        # Save LLM response to text file
-        if hasattr(input_file_path, 'read') and hasattr(input_file_path, 'text'):
-            timestamp = time.strftime("%Y%m%d_%H%M%S")
-            orig_base = f"custom_input_{timestamp}"
-        else:
-            orig_base = os.path.splitext(os.path.basename(input_file_path))[0]
-        logs_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "logs"))
-        os.makedirs(logs_dir, exist_ok=True)
-        text_output_path = os.path.join(logs_dir, f"{orig_base}_LLMLOG.txt")
-        if llm_response:
-            try:
-                with open(text_output_path, "w", encoding="utf-8") as f:
-                    f.write(llm_response)
-                yield f"LLM response saved to: {text_output_path}"
-            except Exception as e:
-                yield f"Failed to save AI response: {e}"
-
-        # Concatenate audio and clean up intermediate files
-        if not skip_tts and temp_audio_files:
-            outputs_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "outputs"))
-            yield "Concatenating audio and cleaning up intermediate files..."
-            # Use a generic name for custom input
-            audio_base = orig_base if orig_base else "output"
-            combined_path = concatenate_and_cleanup_audio(temp_audio_files, outputs_dir, audio_base, pause_ms=1000)
-            cleaned_path = None
-            cleaned_created = False
-            try:
-                cleaned_path = auto_cleaned_filename(combined_path)
-                yield f"Running audio deduplication (Whisper STT)..."
-                for msg in clean_audio_with_stt(combined_path, cleaned_path, whisper_model="base.en"):
-                    yield msg
-                # If deduplication actually created a new file, mark it
-                if os.path.exists(cleaned_path) and os.path.getmtime(cleaned_path) > os.path.getmtime(combined_path):
-                    cleaned_created = True
-            except Exception as e:
-                yield f"Audio deduplication failed: {e}"
+            # Concatenate audio and clean up intermediate files
+            if not skip_tts and temp_audio_files:
+                from Core.audio_utils import concatenate_and_cleanup_audio
+                from Core.audio_deduplication import auto_cleaned_filename, clean_audio_with_stt
+                outputs_dir = OUTPUTS_DIR
+                yield "Concatenating audio and cleaning up intermediate files..."
+                # Use a generic name for custom input
+                audio_base = orig_base if orig_base else "output"
+                combined_path = concatenate_and_cleanup_audio(temp_audio_files, outputs_dir, audio_base, pause_ms=1000)
                 cleaned_path = None
-            # Only use cleaned_path if it was actually created in this run
-            play_target = cleaned_path if cleaned_created else combined_path
-            if play_target and os.path.exists(play_target):
-                yield (play_target, f"Audio generated: {play_target}\nLLM log: {text_output_path}")
-                return
+                cleaned_created = False
+                if combined_path and os.path.exists(combined_path):
+                    # Hand the combined audio to the player now; the cleaned version replaces it
+                    # once deduplication finishes
+                    yield (combined_path, f"Combined audio ready: {combined_path}")
+                try:
+                    cleaned_path = auto_cleaned_filename(combined_path)
+                    yield f"Running audio deduplication (Whisper STT)..."
+                    for msg in clean_audio_with_stt(combined_path, cleaned_path, whisper_model=WHISPER_MODEL):
+                        yield msg
+                    # If deduplication actually created a new file, mark it
+                    if os.path.exists(cleaned_path) and os.path.getmtime(cleaned_path) > os.path.getmtime(combined_path):
+                        cleaned_created = True
+                except Exception as e:
+                    yield f"Audio deduplication failed: {e}"
+                    cleaned_path = None
+                # Only use cleaned_path if it was actually created in this run
+                play_target = cleaned_path if cleaned_created else combined_path
+                if play_target and os.path.exists(play_target):
+                    yield (play_target, f"Audio generated: {play_target}\nLLM log: {text_output_path}")
+                    return
+                else:
+                    yield (None, "Audio generation failed.")
+                    return
             else:
-                yield (None, "Audio generation failed.")
+                yield (None, f"LLM log: {text_output_path}")
                 return
-        else:
-            yield (None, f"LLM log: {text_output_path}")
-            return
+    finally:
+        # Covers early returns and a generator closed before the TTS stage; a no-op once
+        # speech_batch has run
+        if prefetcher:
+            prefetcher.close()
 
@@ -0,0 +1,77 @@
+# ============================================================================
+# app_meta.py - UI options for LegalTTSV2 (Gradio Edition)
+#
+# Voice, model and prompt-template options shared by the Gradio UI and the backend in app.py.
+# Imports nothing beyond the standard library, so the UI can render before the LLM/TTS/document
+# stack that app.py pulls in has been loaded.
+# ============================================================================
+
+import os
+import collections.abc
+
+# Gradio UI options/constants
+VOICE_OPTIONS = [
+    ("Tara", "Female, English, conversational, clear"),
+    ("Leah", "Female, English, warm, gentle"),
+    ("Jess", "Female, English, energetic, youthful"),
+    ("Leo", "Male, English, authoritative, deep"),
+    ("Dan", "Male, English, friendly, casual"),
+    ("Mia", "Female, English, professional, articulate"),
+    ("Zac", "Male, English, enthusiastic, dynamic"),
+    ("Zoe", "Female, English, calm, soothing")
+]
+
+MODEL_OPTIONS = [
+    ("No Model", "no_model"),
+    ("sushruth/solar-uncensored", "sushruth/solar-uncensored"),
+    ("gemma3:1b", "gemma3:1b"),
+    ("mistral:7b", "mistral:7b"),
+    ("llama3:8b", "llama3:8b"),
+    ("Gemini 2.5 Pro (API)", "gemini-2.5-pro"),
+    ("Gemini 2.5 Flash (API)", "gemini-2.5-flash")
+]
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+prompts_dir = os.path.join(project_root, "Prompts")
+
+def _read_prompt_file(path):
+    # Prompt files are small; read the bytes in one call and decode once
+    fd = os.open(path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    try:
+        data = os.read(fd, os.fstat(fd).st_size)
+    finally:
+        os.close(fd)
+    return data.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+
+class _PromptFiles(collections.abc.Mapping):
+    # Prompt templates keyed by file name (without .txt). The directory is listed once at import;
+    # each file is read on first access and re-read only when its mtime changes.
+    def __init__(self, directory):
+        self._paths = {}
+        self._cache = {}  # name -> (mtime, text)
+        if os.path.isdir(directory):
+            with os.scandir(directory) as it:
+                for entry in it:
+                    if entry.name.lower().endswith(".txt"):
+                        self._paths[os.path.splitext(entry.name)[0]] = entry.path
+
+    def __getitem__(self, name):
+        path = self._paths[name]
+        try:
+            mtime = os.stat(path).st_mtime
+            cached = self._cache.get(name)
+            if cached and cached[0] == mtime:
+                return cached[1]
+            text = _read_prompt_file(path)
+        except Exception as e:
+            return f"[Error loading prompt: {e}]"
+        self._cache[name] = (mtime, text)
+        return text
+
+    def __iter__(self):
+        return iter(self._paths)
+
+    def __len__(self):
+        return len(self._paths)
+
+PROMPT_OPTIONS = _PromptFiles(prompts_dir)
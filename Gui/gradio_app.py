@@ -1,9 +1,14 @@
 from __future__ import annotations
 from typing import Iterable
+from collections import deque
+from dataclasses import dataclass
+import functools
 import gradio as gr
-from Gui.app import process_document_backend
-from Gui.app import VOICE_OPTIONS, MODEL_OPTIONS, PROMPT_OPTIONS
+from Gui.app_meta import VOICE_OPTIONS, MODEL_OPTIONS, PROMPT_OPTIONS
 import traceback
+import time
+import threading
+from pathlib import Path
 import gradio.themes as themes
 from gradio.themes.base import Base
 from gradio.themes.utils import colors, fonts, sizes
@@ -11,82 +16,152 @@ from gradio.themes.utils import colors, fonts, sizes
 
 voice_options = VOICE_OPTIONS
 model_options = MODEL_OPTIONS + [("Custom", "__custom__")]
-prompt_options = dict(PROMPT_OPTIONS)
+# Selection lookups built once: model labels and values both resolve to the model value
+MODEL_LOOKUP = {value: value for (label, value) in model_options}
+MODEL_LOOKUP.update((label, value) for (label, value) in model_options)
+VOICE_NAMES = tuple(name for (name, desc) in voice_options)
+VOICE_NAME_SET = frozenset(VOICE_NAMES)
+# Kept as the lazy mapping so prompt files are read when selected, not at startup
+prompt_options = PROMPT_OPTIONS
 PROMPT_LABELS = list(prompt_options.keys()) + ["Custom"]
+# Log lines kept for the Logs / Status box (newest first); older lines are dropped
+MAX_LOG_LINES = 200
+# Minimum seconds between log-only UI updates (at most 10 per second)
+UI_UPDATE_INTERVAL = 0.1
 
-def make_progress_html(label, percent):
-    percent = int(percent)
-    return f"""
-    <div style='width:100%;margin-bottom:4px;'>{label}: {percent}%</div>
-    <div style='width:100%;background:#222;height:18px;border-radius:6px;overflow:hidden;'>
-      <div style='height:100%;width:{percent}%;background:#4caf50;transition:width 0.2s;'></div>
-    </div>
-    """
+# The backend (LLM, TTS and document conversion stack) is imported on first use, so the UI comes up
+# without waiting for it; preload_backend() starts that import in the background at launch.
+@functools.lru_cache(maxsize=None)
+def _get_backend():
+    from Gui.app import process_document_backend
+    return process_document_backend
 
-def gradio_process_document(input_file, model_name, prompt_key, voice_name, custom_prompt_text, skip_tts, llm_progress_html, tts_progress_html, custom_llm_model_name):
+def _hedge_model():
+    from Core.llm_handler import LLM_HEDGE_MODEL
+    return LLM_HEDGE_MODEL
+
+def preload_backend():
+    threading.Thread(target=_get_backend, name="backend-import", daemon=True).start()
+
+@dataclass(frozen=True)
+class ResolvedJob:
+    # UI selections resolved into process_document_backend arguments
+    input_path: str | None  # uploaded file path (None for text input)
+    raw_text: str | None  # Custom LLM Input text (None for file input)
+    model_value: str
+    voice_value: str
+    prompt_text: str
+    hedge: bool = False
+    warning: str | None = None
+
+def resolve_job(source, input_file, input_text, model_name, voice_name, custom_prompt_text, custom_llm_model_name, hedge_llm=False):
+    # Resolve and validate the dropdown/textbox values without touching the backend.
+    # source is "file" (uploaded document) or "text" (Custom LLM Input box).
+    # Returns (ResolvedJob, None), or (None, error message) when the job cannot run.
+    input_path = raw_text = None
+    if source == "text":
+        if not input_text or not input_text.strip():
+            return None, "No input text provided."
+        raw_text = input_text
+    else:
+        input_path = input_file.name if input_file else None
+        if input_path is None:
+            return None, "No input file provided."
+    is_custom_model = model_name == "Custom" or model_name == "__custom__"
+    if is_custom_model:
+        model_value = custom_llm_model_name.strip() if custom_llm_model_name else ""
+        if not model_value:
+            return None, "Please enter a custom LLM model name."
+    else:
+        model_value = MODEL_LOOKUP.get(model_name, model_name)
+    warning = None
+    if voice_name in VOICE_NAME_SET:
+        voice_value = voice_name
+    else:
+        warning = f"[Warning] Voice '{voice_name}' is not available. Defaulting to '{VOICE_NAMES[0]}'."
+        voice_value = VOICE_NAMES[0]
+    return ResolvedJob(
+        input_path=input_path,
+        raw_text=raw_text,
+        model_value=model_value,
+        voice_value=voice_value,
+        prompt_text=custom_prompt_text.strip() if custom_prompt_text else "",
+        # Hedging races the custom Ollama model against LLM_HEDGE_MODEL
+        hedge=bool(hedge_llm) and is_custom_model,
+        warning=warning,
+    ), None
+
+def gradio_process_document(source, input_file, input_text, model_name, voice_name, custom_prompt_text, skip_tts, custom_llm_model_name, hedge_llm=False, progress=gr.Progress()):
+    # Click handler: the prompt box text is always the prompt, passed with the '__custom__' prompt key
     try:
-        logs_persistent = "Starting..."
-        yield None, logs_persistent, make_progress_html("LLM", 0), make_progress_html("Audio", 0)
-        # Accept both file and custom text input objects
-        if hasattr(input_file, 'read') and hasattr(input_file, 'text'):
-            # Custom text input object (from Custom LLM Input)
-            input_file_path = input_file
-        else:
-            input_file_path = input_file.name if input_file else None
-        if input_file_path is None:
-            yield None, "No input file provided.", make_progress_html("LLM", 0), make_progress_html("Audio", 0)
+        logs = deque(["Starting..."], maxlen=MAX_LOG_LINES)
+        yield None, None, "Starting..."
+        job, error = resolve_job(source, input_file, input_text, model_name, voice_name, custom_prompt_text, custom_llm_model_name, hedge_llm)
+        if error:
+            yield None, None, error
             return
-        if model_name == "Custom" or model_name == "__custom__":
-            model_value = custom_llm_model_name.strip()
-            if not model_value:
-                yield None, "Please enter a custom LLM model name.", make_progress_html("LLM", 0), make_progress_html("Audio", 0)
-                return
-        else:
-            model_value = next((v for (label, v) in model_options if label == model_name or v == model_name), model_name)
-        # Validate voice selection
-        available_voice_names = [name for (name, desc) in voice_options]
-        if voice_name not in available_voice_names:
-            warning = f"[Warning] Voice '{voice_name}' is not available. Defaulting to '{available_voice_names[0]}'."
-            logs_persistent = f"{warning}\n{logs_persistent}" if logs_persistent else warning
-            voice_value = available_voice_names[0]
-        else:
-            voice_value = voice_name
-        prompt_text = custom_prompt_text.strip() if custom_prompt_text else ""
-        llm_progress_val = 0
-        tts_progress_val = 0
+        if job.warning:
+            logs.appendleft(job.warning)
+        # Progress goes to Gradio's native progress bar (one numeric update per call)
         def llm_progress_cb(val):
-            nonlocal llm_progress_val, logs_persistent
-            llm_progress_val = val
-            logs_persistent = f"LLM Progress: {llm_progress_val}%\n" + logs_persistent
+            logs.appendleft(f"LLM Progress: {val}%")
+            if progress:
+                progress(val / 100, desc="LLM")
         def tts_progress_cb(val):
-            nonlocal tts_progress_val
-            tts_progress_val = val
+            if progress:
+                progress(val / 100, desc="Audio")
+        # Per-chunk (sample_rate, ndarray) audio from the backend, fed to the streaming player in order
+        chunk_queue = deque()
+        def tts_chunk_cb(sample_rate, samples):
+            chunk_queue.append((sample_rate, samples))
         audio_file_path = None
+        shown_audio_path = None
+        last_emit = 0.0
+        process_document_backend = _get_backend()
         for result in process_document_backend(
-            input_file_path,
-            model_value,
+            job.input_path,
+            job.model_value,
             "__custom__",
-            voice_value,
+            job.voice_value,
             prompt_options,
             voice_options,
-            prompt_text=prompt_text,
+            prompt_text=job.prompt_text,
             skip_tts=skip_tts,
             progress=None,
             llm_progress_cb=llm_progress_cb,
-            tts_progress_cb=tts_progress_cb
+            tts_progress_cb=tts_progress_cb,
+            tts_chunk_cb=None if skip_tts else tts_chunk_cb,
+            hedge_model=_hedge_model() if job.hedge else None,
+            raw_text=job.raw_text
         ):
             if isinstance(result, tuple) and len(result) == 2:
                 audio_file_path, log_line = result
-                logs_persistent = f"{log_line}\n{logs_persistent}" if logs_persistent else log_line
             else:
                 log_line = result
-                logs_persistent = f"{log_line}\n{logs_persistent}" if logs_persistent else log_line
-            yield None, logs_persistent, make_progress_html("LLM", llm_progress_val), make_progress_html("Audio", tts_progress_val)
-        if audio_file_path and not skip_tts:
-            yield audio_file_path, logs_persistent, make_progress_html("LLM", llm_progress_val), make_progress_html("Audio", tts_progress_val)
+            logs.appendleft(log_line)
+            # Stream finished chunks to the live player; the combined (then cleaned) file goes to the
+            # final audio component for download, updated only when its path changes
+            if audio_file_path and not skip_tts and audio_file_path != shown_audio_path:
+                shown_audio_path = audio_file_path
+                file_update = audio_file_path
+            else:
+                file_update = gr.update()
+            # Plain log lines are coalesced into one update per interval; audio chunks and
+            # (audio, log) results always go out immediately
+            now = time.monotonic()
+            if isinstance(result, str) and not chunk_queue and now - last_emit < UI_UPDATE_INTERVAL:
+                continue
+            last_emit = now
+            log_text = "\n".join(logs)
+            while chunk_queue:
+                yield chunk_queue.popleft(), file_update, log_text
+                file_update = gr.update()
+            yield None, file_update, log_text
+        # Flush log lines held back by the throttle
+        yield None, gr.update(), "\n".join(logs)
     except Exception as e:
         tb = traceback.format_exc()
-        yield None, f"Error: {e}\n{tb}", make_progress_html("LLM", 0), make_progress_html("Audio", 0)
+        yield None, gr.update(), f"Error: {e}\n{tb}"
 
 
 
@@ -138,26 +213,45 @@ class RedOnBlack(Base):
             button_large_padding="40px",
         )
 
-red_black_theme = RedOnBlack()
+# The resolved theme is dumped to JSON on first run and loaded from there afterwards, skipping the
+# token resolution in RedOnBlack/Base. Bump THEME_CACHE_VERSION whenever RedOnBlack changes.
+THEME_CACHE_VERSION = "1"
+THEME_CACHE_PATH = Path("~/.cache/legaltts").expanduser() / f"theme_v{THEME_CACHE_VERSION}.json"
+
+def _load_theme():
+    try:
+        if THEME_CACHE_PATH.exists():
+            return gr.Theme.load(str(THEME_CACHE_PATH))
+    except Exception as e:
+        print(f"Warning: Could not load cached theme, rebuilding it: {e}")
+    theme = RedOnBlack()
+    try:
+        THEME_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        theme.dump(str(THEME_CACHE_PATH))
+    except Exception as e:
+        print(f"Warning: Could not cache theme: {e}")
+    return theme
+
+red_black_theme = _load_theme()
 
 with gr.Blocks(theme=red_black_theme, css=None) as demo:
     gr.Markdown("# LegalTTSV2")
     with gr.Row():
         with gr.Column():
-            llm_input_mode = gr.Dropdown(["Input Files", "Custom"], label="LLM Input", value="Input Files")
+            llm_input_mode = gr.Dropdown([("Input Files", "file"), ("Custom", "text")], label="LLM Input", value="file")
             input_file = gr.File(label="Select Input File (PDF, DOCX, RTF, TXT)", file_types=[".pdf", ".docx", ".rtf", ".txt"], visible=True)
             custom_input_text = gr.Textbox(label="Custom LLM Input Text", lines=8, visible=False)
             llm_model = gr.Dropdown([label for (label, value) in model_options], label="LLM Model", value=model_options[0][0])
             custom_llm_model_name = gr.Textbox(label="Custom LLM Model Name (Ollama)", lines=1, visible=False)
+            hedge_llm = gr.Checkbox(label="Hedge LLM (race against a fast fallback model, use whichever answers first)", value=False, visible=False)
             prompt = gr.Dropdown(PROMPT_LABELS, label="Prompt Template", value="Custom")
             prompt_text = gr.Textbox(label="Prompt", lines=4, value="")
-            voice = gr.Dropdown([name for (name, desc) in voice_options], label="Voice", value=voice_options[0][0])
+            voice = gr.Dropdown(list(VOICE_NAMES), label="Voice", value=voice_options[0][0])
             skip_tts = gr.Checkbox(label="Skip TTS (LLM only, no audio)", value=False)
             process_btn = gr.Button("Process and Export Audio", variant="primary")
         with gr.Column():
-            llm_progress = gr.HTML(make_progress_html("LLM", 0))
-            tts_progress = gr.HTML(make_progress_html("Audio", 0))
-            audio_output = gr.Audio(label="Audio Output", interactive=False)
+            audio_output = gr.Audio(label="Audio Output", interactive=False, streaming=True, autoplay=True)
+            audio_file_output = gr.Audio(label="Final Audio (download)", type="filepath", interactive=False)
             logs_output = gr.Textbox(
                 label="Logs / Status",
                 lines=20,
@@ -175,42 +269,27 @@ with gr.Blocks(theme=red_black_theme, css=None) as demo:
         return gr.update(value=prompt_options[selected_prompt])
 
     def show_custom_llm(selected_llm):
-        return gr.update(visible=(selected_llm == "Custom"))
+        return gr.update(visible=(selected_llm == "Custom")), gr.update(visible=(selected_llm == "Custom"))
         
     def show_llm_input_mode(selected_mode):
         return (
-            gr.update(visible=(selected_mode == "Input Files")),
-            gr.update(visible=(selected_mode == "Custom"))
+            gr.update(visible=(selected_mode == "file")),
+            gr.update(visible=(selected_mode == "text"))
         )
 
     prompt.change(update_prompt_text, inputs=prompt, outputs=prompt_text)
-    llm_model.change(show_custom_llm, inputs=llm_model, outputs=custom_llm_model_name)
+    llm_model.change(show_custom_llm, inputs=llm_model, outputs=[custom_llm_model_name, hedge_llm])
     llm_input_mode.change(show_llm_input_mode, inputs=llm_input_mode, outputs=[input_file, custom_input_text])
 
 
 
-    def gradio_process_document_llm_input(llm_input_mode_val, input_file, custom_input_text, llm_model_val, voice_val, prompt_text_val, skip_tts_val, llm_progress_val, tts_progress_val, custom_llm_model_name_val):
-        # Always use prompt_text_val as the prompt, and pass '__custom__' as the prompt key
-        if llm_input_mode_val == "Input Files":
-            gen = gradio_process_document(input_file, llm_model_val, "__custom__", voice_val, prompt_text_val, skip_tts_val, llm_progress_val, tts_progress_val, custom_llm_model_name_val)
-        else:
-            class TextInputObj:
-                def __init__(self, text):
-                    self.name = None
-                    self.text = text
-                def read(self):
-                    return self.text
-            gen = gradio_process_document(TextInputObj(custom_input_text), llm_model_val, "__custom__", voice_val, prompt_text_val, skip_tts_val, llm_progress_val, tts_progress_val, custom_llm_model_name_val)
-        for result in gen:
-            yield result
-
     process_btn.click(
-        gradio_process_document_llm_input,
-        inputs=[llm_input_mode, input_file, custom_input_text, llm_model, voice, prompt_text, skip_tts, llm_progress, tts_progress, custom_llm_model_name],
-        outputs=[audio_output, logs_output, llm_progress, tts_progress]
+        gradio_process_document,
+        inputs=[llm_input_mode, input_file, custom_input_text, llm_model, voice, prompt_text, skip_tts, custom_llm_model_name, hedge_llm],
+        outputs=[audio_output, audio_file_output, logs_output]
     )
 
-    demo.launch(server_name="0.0.0.0")
-
-import gradio as gr
 
+if __name__ == "__main__":
+    preload_backend()
+    demo.launch(server_name="0.0.0.0")
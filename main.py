@@ -14,7 +14,8 @@ def main():
     try:
         from Gui import gradio_app
         log("Launching Gradio app...")
-        gradio_app.demo.launch()
+        gradio_app.preload_backend()
+        gradio_app.demo.launch(server_name="0.0.0.0")
     except Exception as e:
         log(f"Failed to launch Gradio app: {e}")
         raise